@@ -1,10 +1,25 @@
 from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import date as DateOnly
+from typing import Iterator
+import time
 
-from database.engine import make_engine, make_session_factory
-from database.repos.categories import CategoryRepo
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database.engine import make_engines, make_session_factory
+from database.repos.base import DEFER_COMMIT
+from database.repos.categories import CategoryRepo, name_key
 from database.repos.expenses import ExpenseRepo
 from database.repos.cache import ClassificationCacheRepo
+from database.services.hashing import tx_digest
+from database.services.lru import LRUCache
+from database.services.schema import (
+    convert_amounts_to_cents,
+    convert_hex_keys,
+    ensure_indexes,
+)
 from database.services.seed import ensure_seed
 from database.services.reporting import (
     ResultOrder,
@@ -14,32 +29,140 @@ from database.services.saving import save_expenses as save_expenses_service
 from database.tables import Base
 
 DEFAULT_DB_URL = "sqlite:///expense.db"
+# Categories change rarely; how long (seconds) cached category data stays valid.
+CATEGORY_CACHE_TTL = 60.0
+# Entries of the in-process LRU kept in front of the classification_cache table.
+CLASSIFICATION_MEMORY_SIZE = 50_000
 
 
 class Database:
     def __init__(self, db_url: str = DEFAULT_DB_URL, echo: bool = False):
-        self.engine = make_engine(db_url, echo=echo)
+        # Writes (and `session()` units of work) use self.engine; `_read()`
+        # uses read_engine.
+        self.engine, self.read_engine = make_engines(db_url, echo=echo)
         self.Session = make_session_factory(self.engine)
         Base.metadata.create_all(self.engine)
+        ensure_indexes(self.engine)
+        convert_hex_keys(self.engine)
+        convert_amounts_to_cents(self.engine)
         with self.Session() as s:
             ensure_seed(s)
+        # lower(name) -> id and other_id, reloaded every CATEGORY_CACHE_TTL
+        # (another worker may add or rename categories); misses in between
+        # fall back to SQL and are filled in
+        self._category_ids: dict[str, int] = {}
+        self._other_id: int | None = None
+        self._category_ids_expire = 0.0
+        # limit -> (expires_at, names, other_id)
+        self._active_names: dict[int, tuple[float, list[str], int]] = {}
+        # Write-through: every cache_write updates this and the table.
+        self._classified: LRUCache[bytes, int] = LRUCache(CLASSIFICATION_MEMORY_SIZE)
+        # Session shared by calls inside `with db.session():` (per instance)
+        self._current: ContextVar[Session | None] = ContextVar(
+            f"database_session_{id(self)}", default=None
+        )
+        self._category_id_map()
+
+    @contextmanager
+    def session(self) -> Iterator[Session]:
+        """
+        Run every Database call inside the block on one Session and one
+        transaction, e.g. a whole classify batch, instead of opening and
+        committing one per method call. Writes commit once when the block
+        exits and roll back if it raises. Nested blocks reuse the outer Session.
+        """
+        current = self._current.get()
+        if current is not None:
+            yield current
+            return
+        with self.Session() as s:
+            s.info[DEFER_COMMIT] = True
+            token = self._current.set(s)
+            try:
+                yield s
+                s.commit()
+            finally:
+                self._current.reset(token)
+
+    @contextmanager
+    def _read(self) -> Iterator[Session | Connection]:
+        """
+        Ambient session if one is open, else a pooled connection for Core-only
+        reads (no Session or identity map).
+        """
+        current = self._current.get()
+        if current is not None:
+            yield current
+            return
+        with self.read_engine.connect() as conn:
+            yield conn
 
     # ---------------- Category helpers ----------------
+    def _category_id_map(self) -> dict[str, int]:
+        now = time.monotonic()
+        if self._category_ids_expire <= now:
+            with self._read() as conn:
+                self._category_ids = CategoryRepo(conn).ids_by_lower_name()
+            self._other_id = self._category_ids.get("other")
+            self._category_ids_expire = now + CATEGORY_CACHE_TTL
+        return self._category_ids
+
     def get_or_create_other(self) -> int:
-        with self.Session() as s:
-            return CategoryRepo(s).get_or_create_other()
+        self._category_id_map()
+        if self._other_id is None:
+            with self.session() as s:
+                self._other_id = CategoryRepo(s).get_or_create_other()
+            self._category_ids["other"] = self._other_id
+        return self._other_id
 
     def get_active_category_names_with_other(
         self, limit: int = 50
     ) -> tuple[list[str], int]:
-        with self.Session() as s:
-            return CategoryRepo(s).active_names_with_other(limit)
+        now = time.monotonic()
+        cached = self._active_names.get(limit)
+        if cached is None or cached[0] <= now:
+            with self.session() as s:
+                names, other_id = CategoryRepo(s).active_names_with_other(limit)
+            cached = (now + CATEGORY_CACHE_TTL, names, other_id)
+            self._active_names[limit] = cached
+            self._other_id = other_id
+        return list(cached[1]), cached[2]
+
+    def _find_category_id(self, name: str) -> int | None:
+        key = name_key(name)
+        ids = self._category_id_map()
+        cat_id = ids.get(key)
+        if cat_id is None:
+            with self._read() as conn:
+                cat_id = CategoryRepo(conn).find_id(name)
+            if cat_id is not None:
+                ids[key] = cat_id
+        return cat_id
 
     def resolve_category_id(
         self, name: str, fallback_other_id: int | None = None
     ) -> int:
-        with self.Session() as s:
-            return CategoryRepo(s).resolve_id(name, fallback_other_id)
+        cat_id = self._find_category_id(name)
+        if cat_id is not None:
+            return cat_id
+        return (
+            fallback_other_id
+            if fallback_other_id is not None
+            else self.get_or_create_other()
+        )
+
+    def _category_filter(self, category: int | str):
+        """
+        Category id for filtering expense queries: the id itself, the cached id
+        for a name, or on a cache miss an inline subquery (same fallback to
+        'other' as resolve_category_id) so no separate lookup runs first.
+        """
+        if isinstance(category, int):
+            return category
+        cat_id = self._category_id_map().get(name_key(category))
+        if cat_id is not None:
+            return cat_id
+        return CategoryRepo.id_or_other_expr(category)
 
     # ---------------- Expenses ----------------
     def add_expense(
@@ -51,19 +174,22 @@ class Database:
         category_id: int,
         raw: dict | None = None,
         dedupe_on_hash: bool = True,
+        precomputed_hash: bytes | None = None,
     ) -> int:
         """
         Insert an expense. If raw and dedupe_on_hash=True, compute a stable hash
         of raw and avoid inserting duplicates (returns existing id instead).
+        Pass precomputed_hash (tx_digest(raw)) to skip hashing raw again.
         """
-        with self.Session() as s:
-            return ExpenseRepo(s).add_with_dedupe(
+        with self.session() as s:
+            return ExpenseRepo(s).add(
                 date=date,
                 amount=amount,
                 description=description,
                 category_id=category_id,
                 raw=raw,
                 dedupe_on_hash=dedupe_on_hash,
+                precomputed_hash=precomputed_hash,
             )
 
     def save_expenses(
@@ -72,8 +198,15 @@ class Database:
         """
         Saves a list of expense items to the database.
         """
-        with self.Session() as s:
-            return save_expenses_service(s, items, dedupe_on_hash=dedupe_on_hash)
+        with self.session() as s:
+            # Names seen before resolve from the category cache, not SQL
+            return save_expenses_service(
+                s,
+                items,
+                dedupe_on_hash=dedupe_on_hash,
+                known_ids=self._category_id_map(),
+                other_id=self._other_id,
+            )
 
     def list_expenses(
         self,
@@ -81,14 +214,18 @@ class Database:
         limit: int = 50,
         offset: int = 0,
         since: DateOnly | None = None,
+        before: tuple[DateOnly, float, int] | None = None,
     ) -> list[dict]:
         """
         Return stored expenses, most recent first by date, amount desc, id desc.
-        Dict keys: date (YYYY-MM-DD), description, amount, category, created_at (ISO or None).
+        Dict keys: id, date (YYYY-MM-DD), description, amount, category, created_at (ISO or None).
+        before: (date, amount, id) of the previous page's last row, to page
+        without an offset.
         """
-        with self.Session() as s:
-            rows = ExpenseRepo(s).list_recent(limit=limit, offset=offset, since=since)
-            return rows
+        with self._read() as conn:
+            return ExpenseRepo(conn).list_recent(
+                limit=limit, offset=offset, since=since, before=before
+            )
 
     def get_expenses_between(
         self,
@@ -104,17 +241,13 @@ class Database:
         Return expenses within [start_date, end_date], optionally filtered by category
         (id or name). Ordered by date then id. Returns JSON-friendly dicts.
         """
-        with self.Session() as s:
-            category_id: int | None = None
-            if isinstance(category, int):
-                category_id = category
-            elif isinstance(category, str):
-                category_id = CategoryRepo(s).resolve_id(category)
-
-            return ExpenseRepo(s).between(
+        with self._read() as conn:
+            return ExpenseRepo(conn).between(
                 start=start_date,
                 end=end_date,
-                category_id=category_id,
+                category_id=(
+                    None if category is None else self._category_filter(category)
+                ),
                 limit=limit,
                 offset=offset,
                 order=order,
@@ -129,24 +262,96 @@ class Database:
         """
         Sum 'amount' for a single category (id or name) within [start_date, end_date].
         """
-        with self.Session() as s:
-            category_id = (
-                category
-                if isinstance(category, int)
-                else CategoryRepo(s).resolve_id(category)
+        with self._read() as conn:
+            return ExpenseRepo(conn).sum_for_category(
+                self._category_filter(category), start_date, end_date
             )
-            return ExpenseRepo(s).sum_for_category(category_id, start_date, end_date)
+
+    def sum_for_categories_between(
+        self,
+        categories: list[int | str],
+        start_date: DateOnly,
+        end_date: DateOnly,
+    ) -> dict[int | str, float]:
+        """
+        sum_for_category_between for several categories (ids or names) in one
+        query. Keys are the categories as passed.
+        """
+        ids = {
+            c: c if isinstance(c, int) else self.resolve_category_id(c)
+            for c in categories
+        }
+        with self._read() as conn:
+            sums = ExpenseRepo(conn).sum_for_categories(
+                list(ids.values()), start_date, end_date
+            )
+        return {c: sums[cat_id] for c, cat_id in ids.items()}
 
     # ---------------- Cache ----------------
-    def cache_lookup(self, tx: dict) -> int | None:
+    # Every cache method takes optional precomputed keys (cache_key(tx)) so a
+    # payload that is looked up and then written is only hashed once.
+    @staticmethod
+    def cache_key(tx: dict) -> bytes:
+        """Cache key of a tx payload."""
+        return tx_digest(tx)
+
+    def cache_lookup(self, tx: dict, *, key: bytes | None = None) -> int | None:
         """Return cached category_id for a normalized tx payload, or None."""
-        with self.Session() as s:
-            return ClassificationCacheRepo(s).lookup(tx)
+        key = key or tx_digest(tx)
+        cat_id = self._classified.get(key)
+        if cat_id is None:
+            with self._read() as conn:
+                cat_id = ClassificationCacheRepo(conn).lookup(key)
+            if cat_id is not None:
+                self._classified.put(key, cat_id)
+        return cat_id
+
+    def cache_lookup_many(
+        self, txs: list[dict], *, keys: list[bytes] | None = None
+    ) -> list[int | None]:
+        """Cached category_id (or None) for each tx payload, in input order."""
+        keys = keys or [tx_digest(tx) for tx in txs]
+        results = [self._classified.get(k) for k in keys]
+        missing = [i for i, cat_id in enumerate(results) if cat_id is None]
+        if missing:
+            with self._read() as conn:
+                found = ClassificationCacheRepo(conn).lookup_many(
+                    [keys[i] for i in missing]
+                )
+            for i, cat_id in zip(missing, found):
+                if cat_id is not None:
+                    self._classified.put(keys[i], cat_id)
+                    results[i] = cat_id
+        return results
 
-    def cache_write(self, tx: dict, category_id: int) -> None:
+    def cache_write(
+        self, tx: dict, category_id: int, *, key: bytes | None = None
+    ) -> None:
         """Write/overwrite cache entry for a tx payload -> category_id."""
-        with self.Session() as s:
-            ClassificationCacheRepo(s).write(tx, category_id)
+        key = key or tx_digest(tx)
+        with self.session() as s:
+            ClassificationCacheRepo(s).write(key, category_id)
+        self._classified.put(key, int(category_id))
+
+    def cache_write_many(
+        self, pairs: list[tuple[dict, int]], *, keys: list[bytes] | None = None
+    ) -> None:
+        """Write/overwrite cache entries for (tx payload, category_id) pairs."""
+        if not pairs:
+            return
+        keys = keys or [tx_digest(tx) for tx, _ in pairs]
+        self.cache_write_keys(
+            [(key, int(cat_id)) for key, (_, cat_id) in zip(keys, pairs)]
+        )
+
+    def cache_write_keys(self, items: list[tuple[bytes, int]]) -> None:
+        """cache_write_many for (cache key, category_id) pairs, no payloads."""
+        if not items:
+            return
+        with self.session() as s:
+            ClassificationCacheRepo(s).write_many(items)
+        for key, cat_id in items:
+            self._classified.put(key, cat_id)
 
     # ---------------- Reporting ----------------
     def totals_by_category(
@@ -154,7 +359,7 @@ class Database:
         start_date: DateOnly,
         end_date: DateOnly,
         *,
-        only_active: bool = True,
+        only_active: bool | None = True,
         include_zero: bool = False,
         order: ResultOrder = ResultOrder.DESC,  # "desc" | "asc"
         limit: int | None = None,
@@ -166,9 +371,9 @@ class Database:
         - include_zero: include categories with zero spend
         - order: by amount desc/asc or by name
         """
-        with self.Session() as s:
+        with self._read() as conn:
             return totals_by_category_service(
-                s,
+                conn,
                 start_date,
                 end_date,
                 only_active=only_active,
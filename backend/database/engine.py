@@ -1,32 +1,117 @@
 # database/engine.py
-from sqlalchemy import create_engine, event
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
 
+# Applied to every new SQLite connection. WAL + synchronous=NORMAL keep commits
+# cheap; the cache/mmap sizes keep reporting scans in memory.
+SQLITE_PRAGMAS: tuple[tuple[str, str | int], ...] = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", 2000),
+    ("temp_store", "MEMORY"),
+    ("cache_size", -65536),  # 64 MB page cache
+    ("mmap_size", 268435456),  # 256 MB memory-mapped I/O
+    ("wal_autocheckpoint", 1000),
+    ("foreign_keys", "ON"),
+)
+# Reader connections: journal_mode is a property of the file (set by the
+# writer), and query_only rejects writes at the SQLite level.
+SQLITE_READ_PRAGMAS = tuple(p for p in SQLITE_PRAGMAS if p[0] != "journal_mode") + (
+    ("query_only", "ON"),
+)
+# Handlers run DB calls on asyncio's worker threads, each holding a pooled
+# connection; size the pool so concurrent requests don't queue on checkout.
+POOL_OPTIONS = {"pool_size": 20, "max_overflow": 10, "pool_timeout": 30}
 
-def make_engine(db_url: str, echo: bool = False):
+
+def _pool_options(db_url: str) -> dict:
+    url = make_url(db_url)
+    if url.get_backend_name() != "sqlite":
+        # Server connections can drop while idle; check them on checkout
+        return {**POOL_OPTIONS, "pool_pre_ping": True}
+    if url.database in (None, "", ":memory:"):
+        # In-memory SQLite keeps one connection per thread (no sizing)
+        return {}
+    return POOL_OPTIONS
+
+
+def make_engine(db_url: str, echo: bool = False, *, readonly: bool = False):
     engine = create_engine(
         db_url,
         echo=echo,
         future=True,
+        **_pool_options(db_url),
         connect_args=(
             {"check_same_thread": False} if db_url.startswith("sqlite") else {}
         ),
     )
     if db_url.startswith("sqlite"):
-        _apply_sqlite_pragmas(engine)
+        _apply_sqlite_pragmas(
+            engine, SQLITE_READ_PRAGMAS if readonly else SQLITE_PRAGMAS
+        )
+        if not readonly:
+            _begin_immediate(engine)
     return engine
 
 
-def _apply_sqlite_pragmas(engine):
+def make_engines(db_url: str, echo: bool = False):
+    """
+    (writer, reader) engines. On SQLite files, readers get their own pool of
+    query_only connections so reporting/list queries never queue behind the
+    writer's connections. In-memory databases are per connection, so both
+    roles share one engine there.
+    """
+    writer = make_engine(db_url, echo=echo)
+    url = make_url(db_url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return writer, writer
+    return writer, make_engine(db_url, echo=echo, readonly=True)
+
+
+def _apply_sqlite_pragmas(engine, pragmas=SQLITE_PRAGMAS):
     @event.listens_for(engine, "connect")
     def set_sqlite_pragma(dbapi_connection, _):
         cur = dbapi_connection.cursor()
-        cur.execute("PRAGMA journal_mode=WAL;")
-        cur.execute("PRAGMA synchronous=NORMAL;")
-        cur.execute("PRAGMA busy_timeout=2000;")
-        cur.execute("PRAGMA temp_store=MEMORY;")
+        for name, value in pragmas:
+            cur.execute(f"PRAGMA {name}={value};")
         cur.close()
 
 
+def _begin_immediate(engine):
+    """
+    Writer transactions start with BEGIN IMMEDIATE: the write lock is taken
+    up front (waiting up to busy_timeout) instead of on the first DML, where a
+    deferred transaction that lost the race fails with SQLITE_BUSY.
+    """
+
+    @event.listens_for(engine, "connect")
+    def disable_driver_transactions(dbapi_connection, _):
+        # pysqlite would otherwise emit its own deferred BEGIN
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
 def make_session_factory(engine):
-    return sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    # expire_on_commit=False: ids/attributes stay readable after commit
+    # without a re-SELECT per object.
+    return sessionmaker(
+        bind=engine,
+        autoflush=False,
+        autocommit=False,
+        expire_on_commit=False,
+        future=True,
+    )
+
+
+def insert_for(s: Session, entity):
+    """INSERT construct of the session's dialect, so ON CONFLICT clauses are available."""
+    dialect = s.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(entity)
+    if dialect == "postgresql":
+        return postgresql.insert(entity)
+    raise NotImplementedError(f"No upsert support for dialect {dialect!r}")
@@ -1,6 +1,20 @@
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 
+# Session.info flag: the session is a wider unit of work (Database.session())
+# that commits once at its end, so repos only flush.
+DEFER_COMMIT = "defer_commit"
+# Bound parameters per statement; stays under SQLite's historic 999 limit.
+MAX_BOUND_PARAMS = 900
+
 
 class BaseRepo:
-    def __init__(self, session: Session):
+    # Read-only repos also accept a plain Connection (Core statements only).
+    def __init__(self, session: Session | Connection):
         self.s = session
+
+    def _commit(self) -> None:
+        if self.s.info.get(DEFER_COMMIT):
+            self.s.flush()
+        else:
+            self.s.commit()
@@ -1,19 +1,49 @@
-from database.repos.base import BaseRepo
+from sqlalchemy import select, text
+
+from database.engine import insert_for
+from database.repos.base import MAX_BOUND_PARAMS, BaseRepo
 from database.tables import ClassificationCache
-from database.services.hashing import hash
+
+# Hot path: a fixed SQL string skips statement construction and compilation,
+# and lets the DB-API driver reuse its prepared statement.
+_LOOKUP_SQL = text("SELECT category_id FROM classification_cache WHERE hash = :hash")
 
 
 class ClassificationCacheRepo(BaseRepo):
-    def lookup(self, tx: dict) -> int | None:
-        key = hash(tx)
-        row = self.s.get(ClassificationCache, key)
-        return int(row.category_id) if row else None
+    # Keys are hashing.tx_digest() of the tx payload.
+    def lookup(self, key: bytes) -> int | None:
+        cat_id = self.s.execute(_LOOKUP_SQL, {"hash": key}).scalar_one_or_none()
+        return int(cat_id) if cat_id is not None else None
+
+    def lookup_many(self, keys: list[bytes]) -> list[int | None]:
+        unique = list(set(keys))
+        found: dict[bytes, int] = {}
+        for i in range(0, len(unique), MAX_BOUND_PARAMS):
+            rows = self.s.execute(
+                select(ClassificationCache.hash, ClassificationCache.category_id).where(
+                    ClassificationCache.hash.in_(unique[i : i + MAX_BOUND_PARAMS])
+                )
+            )
+            found.update((h, int(cid)) for h, cid in rows)
+        return [found.get(k) for k in keys]
+
+    def write(self, key: bytes, category_id: int) -> None:
+        self.write_many([(key, category_id)])
 
-    def write(self, tx: str, category_id: int) -> None:
-        key = hash(tx)
-        existing = self.s.get(ClassificationCache, key)
-        if existing:
-            existing.category_id = int(category_id)
-        else:
-            self.s.add(ClassificationCache(hash=key, category_id=int(category_id)))
-        self.s.commit()
+    def write_many(self, items: list[tuple[bytes, int]]) -> None:
+        """Upsert (key, category_id) pairs with one multi-row INSERT per chunk."""
+        # Last write wins for a repeated key, as with successive write() calls
+        rows = [{"hash": k, "category_id": int(cid)} for k, cid in dict(items).items()]
+        per_stmt = MAX_BOUND_PARAMS // 2
+        for i in range(0, len(rows), per_stmt):
+            stmt = insert_for(self.s, ClassificationCache).values(
+                rows[i : i + per_stmt]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ClassificationCache.hash],
+                set_={"category_id": stmt.excluded.category_id},
+                # Re-writing the same answer leaves the row (and its page) untouched
+                where=ClassificationCache.category_id != stmt.excluded.category_id,
+            )
+            self.s.execute(stmt)
+        self._commit()
@@ -1,22 +1,101 @@
-from database.repos.base import BaseRepo
+import string
+
+from sqlalchemy import bindparam, func, select
+
+from database.engine import insert_for
+from database.repos.base import MAX_BOUND_PARAMS, BaseRepo
 from database.tables import Category
 
+# SQLite's lower() folds ASCII letters only ('ÉPICERIE' -> 'Épicerie'), so SQL
+# lowers both sides of a comparison and in-process maps key names the same way.
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def name_key(name: str) -> str:
+    """A category name folded like lower(name) and ix_categories_name_lower."""
+    return name.translate(_ASCII_LOWER)
+
+
+# Built once; callers only bind the name.
+_ID_BY_LOWER_NAME = (
+    select(Category.id)
+    .where(func.lower(Category.name) == func.lower(bindparam("name")))
+    .limit(1)
+)
+
 
 class CategoryRepo(BaseRepo):
+    def find_id(self, name: str) -> int | None:
+        return self.s.execute(_ID_BY_LOWER_NAME, {"name": name}).scalar()
+
+    def ids_by_lower_name(self) -> dict[str, int]:
+        return {
+            name_key(name): cat_id
+            for cat_id, name in self.s.execute(select(Category.id, Category.name))
+        }
+
+    @staticmethod
+    def id_or_other_expr(name: str):
+        """
+        SQL expression for resolve_id(name) so callers can inline the lookup
+        in their own statement instead of running it first.
+        """
+
+        def by_name(n: str):
+            return (
+                select(Category.id)
+                .where(func.lower(Category.name) == func.lower(n))
+                .limit(1)
+                .scalar_subquery()
+            )
+
+        return func.coalesce(by_name(name), by_name("other"))
+
     def get_or_create_other(self) -> int:
-        row = self.s.query(Category).filter(Category.name.ilike("other")).first()
-        if row:
-            return row.id
-        row = Category(name="other", description="Fallback category")
-        self.s.add(row)
-        self.s.commit()
-        self.s.refresh(row)
-        return row.id
+        other_id = self.find_id("other")
+        if other_id is not None:
+            return other_id
+        other_id = self.s.execute(
+            insert_for(self.s, Category)
+            .values(name="other", description="Fallback category")
+            .returning(Category.id)
+        ).scalar_one()
+        self._commit()
+        return other_id
+
+    def resolve_ids_bulk(
+        self, names: set[str], fallback_other_id: int
+    ) -> dict[str, int]:
+        """resolve_id for many names at once; keys are the names' name_key."""
+        wanted = list({name_key(n) for n in names})
+        found: dict[str, int] = {}
+        for start in range(0, len(wanted), MAX_BOUND_PARAMS):
+            chunk = wanted[start : start + MAX_BOUND_PARAMS]
+            found.update(
+                (name_key(name), cat_id)
+                for cat_id, name in self.s.execute(
+                    select(Category.id, Category.name).where(
+                        func.lower(Category.name).in_([func.lower(n) for n in chunk])
+                    )
+                )
+            )
+        return {n: found.get(n, fallback_other_id) for n in wanted}
+
+    def existing_ids(self, ids: set[int]) -> set[int]:
+        """The subset of ids that are stored categories."""
+        wanted = list(ids)
+        found: set[int] = set()
+        for start in range(0, len(wanted), MAX_BOUND_PARAMS):
+            chunk = wanted[start : start + MAX_BOUND_PARAMS]
+            found.update(
+                self.s.scalars(select(Category.id).where(Category.id.in_(chunk)))
+            )
+        return found
 
     def resolve_id(self, name: str, fallback_other_id: int | None = None) -> int:
-        row = self.s.query(Category).filter(Category.name.ilike(name)).first()
-        if row:
-            return row.id
+        cat_id = self.find_id(name)
+        if cat_id is not None:
+            return cat_id
         return (
             fallback_other_id
             if fallback_other_id is not None
@@ -25,13 +104,13 @@ class CategoryRepo(BaseRepo):
 
     def active_names_with_other(self, limit: int = 50) -> tuple[list[str], int]:
         other_id = self.get_or_create_other()
-        names = [
-            r.name
-            for r in self.s.query(Category)
-            .filter(Category.is_active.is_(True))
-            .order_by(Category.name)
-            .all()
-        ] or ["other"]
-        if "other" not in {n.lower() for n in names}:
+        names = list(
+            self.s.scalars(
+                select(Category.name)
+                .where(Category.is_active.is_(True))
+                .order_by(Category.name)
+            )
+        ) or ["other"]
+        if "other" not in {name_key(n) for n in names}:
             names.append("other")
         return names[:limit], other_id
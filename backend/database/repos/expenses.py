@@ -1,9 +1,25 @@
-from sqlalchemy import select, func
-from database.repos.base import BaseRepo
-from database.tables import Expense, Category
-from database.services.hashing import hash
+from sqlalchemy import ColumnElement, bindparam, select, func, tuple_
+from database.engine import insert_for
+from database.repos.base import MAX_BOUND_PARAMS, BaseRepo
+from database.tables import Expense, Category, to_cents
+from database.services.hashing import tx_digest
 from database.services.reporting import ResultOrder
 from datetime import date as DateOnly
+from typing import Iterator
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Hot statements built once at import: per call only the parameters change,
+# and the compiled form is reused from the engine's compiled cache.
+_SUM_BETWEEN = (
+    select(func.coalesce(func.sum(Expense.amount_cents), 0) / 100.0)
+    .where(Expense.category_id == bindparam("category_id"))
+    .where(Expense.date.between(bindparam("start"), bindparam("end")))
+)
+_ID_BY_HASH = select(Expense.id).where(Expense.hash == bindparam("hash"))
+# Rows fetched per cursor round when streaming range queries
+_YIELD_PER = 1000
 
 
 class ExpenseRepo(BaseRepo):
@@ -16,34 +32,87 @@ class ExpenseRepo(BaseRepo):
         category_id: int,
         raw: dict | None = None,
         dedupe_on_hash: bool = True,
+        precomputed_hash: bytes | None = None,
     ) -> int:
-        hash_val = self._key_for_raw(raw)
+        # precomputed_hash: tx_digest(raw) the caller already has
+        hash_val = precomputed_hash or self._key_for_raw(raw)
+        stmt = (
+            insert_for(self.s, Expense)
+            .values(
+                date=date,
+                amount_cents=to_cents(amount),
+                description=description or "",
+                category_id=category_id,
+                hash=hash_val,
+            )
+            .returning(Expense.id)
+        )
         if dedupe_on_hash and hash_val:
-            existing_id = self._find_id_by_hash(hash_val)
-            if existing_id:
-                return existing_id
-        exp = Expense(
-            date=date,
-            amount=amount,
-            description=description or "",
-            category_id=category_id,
-            hash=hash_val,
+            # Nothing comes back when the hash is already stored
+            stmt = stmt.on_conflict_do_nothing(index_elements=[Expense.hash])
+        new_id = self.s.execute(stmt).scalar()
+        if new_id is None:
+            return self._find_id_by_hash(hash_val)
+        self._commit()
+        logger.debug("Added expense id=%d", new_id)
+        return new_id
+
+    def add_many(self, rows: list[dict], *, dedupe_on_hash: bool = True) -> list[int]:
+        """
+        Insert expense rows (keys: date, amount_cents, description, category_id,
+        hash)
+        with one INSERT ... ON CONFLICT(hash) DO NOTHING RETURNING and a single
+        commit. Returns ids in input order; duplicates (already stored or
+        repeated within `rows`) get the id of the stored row.
+        """
+        if not rows:
+            return []
+        stmt = insert_for(self.s, Expense)
+        if not dedupe_on_hash:
+            ids = self.s.scalars(
+                stmt.returning(Expense.id, sort_by_parameter_order=True), rows
+            ).all()
+            self._commit()
+            logger.info("Inserted %d expenses", len(ids))
+            return list(ids)
+
+        stmt = stmt.on_conflict_do_nothing(index_elements=[Expense.hash])
+        ids = {
+            h: row_id
+            for row_id, h in self.s.execute(
+                stmt.returning(Expense.id, Expense.hash), rows
+            )
+        }
+        inserted = len(ids)
+        # Already-stored hashes; chunked to stay within the parameter limit
+        missing = list({r["hash"] for r in rows} - ids.keys())
+        for start in range(0, len(missing), MAX_BOUND_PARAMS):
+            chunk = missing[start : start + MAX_BOUND_PARAMS]
+            ids.update(
+                (h, row_id)
+                for row_id, h in self.s.execute(
+                    select(Expense.id, Expense.hash).where(Expense.hash.in_(chunk))
+                )
+            )
+        self._commit()
+        logger.info(
+            "Inserted %d expenses (%d duplicates)", inserted, len(rows) - inserted
         )
-        self.s.add(exp)
-        self.s.commit()
-        self.s.refresh(exp)
-        print(f"Added expense: {exp}")
-        return exp.id
+        return [ids[r["hash"]] for r in rows]
 
-    def between(
+    def iter_between(
         self,
         start: DateOnly,
         end: DateOnly,
-        category_id: int | None = None,
+        category_id: int | ColumnElement[int] | None = None,
         limit: int | None = None,
         offset: int = 0,
-        order: ResultOrder = ResultOrder.DESC,
-    ) -> list[dict]:
+        order: ResultOrder | str = ResultOrder.DESC,
+    ) -> Iterator[dict]:
+        """
+        Rows of between() as a generator, fetched from the cursor in batches,
+        so large ranges aren't held in memory as a whole.
+        """
         stmt = (
             select(
                 Expense.id,
@@ -51,7 +120,7 @@ class ExpenseRepo(BaseRepo):
                 Expense.amount,
                 Expense.description,
                 Expense.category_id,
-                Category.name.label("category_name"),
+                Category.name,
             )
             .join(Category, Category.id == Expense.category_id)
             .where(Expense.date.between(start, end))
@@ -60,39 +129,77 @@ class ExpenseRepo(BaseRepo):
             stmt = stmt.where(Expense.category_id == category_id)
         stmt = (
             stmt.order_by(Expense.date.desc(), Expense.id.desc())
-            if order == ResultOrder.DESC
+            if ResultOrder(order) == ResultOrder.DESC
             else stmt.order_by(Expense.date.asc(), Expense.id.asc())
         )
         if limit is not None:
             stmt = stmt.limit(limit).offset(offset)
-        rows = self.s.execute(stmt).all()
-        return [
-            {
-                "id": r.id,
-                "date": r.date,
-                "amount": float(r.amount),
-                "description": r.description,
-                "category_id": r.category_id,
-                "category_name": r.category_name,
+        rows = self.s.execute(stmt.execution_options(yield_per=_YIELD_PER))
+        for row_id, d, amount, description, cat_id, cat_name in rows:
+            yield {
+                "id": row_id,
+                "date": d,
+                "amount": amount,
+                "description": description,
+                "category_id": cat_id,
+                "category_name": cat_name,
             }
-            for r in rows
-        ]
+
+    def between(
+        self,
+        start: DateOnly,
+        end: DateOnly,
+        category_id: int | ColumnElement[int] | None = None,
+        limit: int | None = None,
+        offset: int = 0,
+        order: ResultOrder | str = ResultOrder.DESC,
+    ) -> list[dict]:
+        return list(self.iter_between(start, end, category_id, limit, offset, order))
 
     def sum_for_category(
-        self, category_id: int, start: DateOnly, end: DateOnly
+        self, category_id: int | ColumnElement[int], start: DateOnly, end: DateOnly
     ) -> float:
-        stmt = (
-            select(func.coalesce(func.sum(Expense.amount), 0.0))
-            .where(Expense.category_id == category_id)
-            .where(Expense.date.between(start, end))
-        )
-        return float(self.s.execute(stmt).scalar_one() or 0.0)
+        params = {"start": start, "end": end}
+        if isinstance(category_id, int):
+            stmt, params["category_id"] = _SUM_BETWEEN, category_id
+        else:
+            # Inline category subquery, see CategoryRepo.id_or_other_expr
+            stmt = (
+                select(func.coalesce(func.sum(Expense.amount_cents), 0) / 100.0)
+                .where(Expense.category_id == category_id)
+                .where(Expense.date.between(bindparam("start"), bindparam("end")))
+            )
+        return float(self.s.execute(stmt, params).scalar_one() or 0.0)
+
+    def sum_for_categories(
+        self, category_ids: list[int], start: DateOnly, end: DateOnly
+    ) -> dict[int, float]:
+        """
+        sum_for_category for many ids with one GROUP BY scan per chunk instead
+        of one aggregation per id. Ids without expenses map to 0.0.
+        """
+        wanted = list(set(category_ids))
+        sums = dict.fromkeys(wanted, 0.0)
+        for i in range(0, len(wanted), MAX_BOUND_PARAMS):
+            chunk = wanted[i : i + MAX_BOUND_PARAMS]
+            sums.update(
+                self.s.execute(
+                    select(
+                        Expense.category_id,
+                        func.sum(Expense.amount_cents) / 100.0,
+                    )
+                    .where(Expense.category_id.in_(chunk))
+                    .where(Expense.date.between(start, end))
+                    .group_by(Expense.category_id)
+                ).all()
+            )
+        return sums
 
-    def _key_for_raw(self, raw: dict | None) -> str | None:
-        return hash(raw) if raw else None
+    def _key_for_raw(self, raw: dict | None) -> bytes | None:
+        return tx_digest(raw) if raw else None
 
-    def _find_id_by_hash(self, key: str) -> int | None:
-        row = self.s.execute(select(Expense.id).where(Expense.hash == key)).first()
+    def _find_id_by_hash(self, key: bytes) -> int | None:
+        row = self.s.execute(_ID_BY_HASH, {"hash": key}).first()
         return int(row[0]) if row else None
 
     def list_recent(
@@ -101,7 +208,13 @@ class ExpenseRepo(BaseRepo):
         limit: int = 50,
         offset: int = 0,
         since: DateOnly | None = None,
+        before: tuple[DateOnly, float, int] | None = None,
     ) -> list[dict]:
+        """
+        before: (date, amount, id) of the last row of the previous page; the
+        page continues after it (keyset pagination, a seek on the
+        (date, amount, id) index) instead of skipping `offset` rows.
+        """
         stmt = select(
             Expense.id,
             Expense.date,
@@ -112,19 +225,29 @@ class ExpenseRepo(BaseRepo):
         ).join(Category, Expense.category_id == Category.id, isouter=True)
         if since is not None:
             stmt = stmt.where(Expense.date >= since)
+        if before is not None:
+            d, amount, row_id = before
+            stmt = stmt.where(
+                tuple_(Expense.date, Expense.amount_cents, Expense.id)
+                < (d, to_cents(amount), row_id)
+            )
         stmt = (
-            stmt.order_by(Expense.date.desc(), Expense.amount.desc(), Expense.id.desc())
+            stmt.order_by(
+                Expense.date.desc(), Expense.amount_cents.desc(), Expense.id.desc()
+            )
             .limit(limit)
             .offset(offset)
         )
-        rows = self.s.execute(stmt).all()
         return [
             {
-                "date": r.date.isoformat(),
-                "description": r.description,
-                "amount": float(r.amount),
-                "category": r.category_name,
-                "created_at": r.created_at.isoformat() if r.created_at else None,
+                "id": row_id,
+                "date": d.isoformat(),
+                "description": description,
+                "amount": amount,
+                "category": category_name,
+                "created_at": created_at.isoformat() if created_at else None,
             }
-            for r in rows
+            for row_id, d, amount, description, created_at, category_name in (
+                self.s.execute(stmt)
+            )
         ]
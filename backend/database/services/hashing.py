@@ -1,10 +1,57 @@
 import json, hashlib
+from functools import lru_cache
 
+import orjson
 
-def normalize_for_hash(payload: dict) -> str:
-    return json.dumps(payload, sort_keys=True, separators=(",", ":"))
+# Bound once: hashlib's sha256 is OpenSSL's, which uses SHA-NI when the CPU has it.
+_sha256 = hashlib.sha256
 
 
-def hash(text: str | dict) -> str:
-    normalized_text = normalize_for_hash(text) if isinstance(text, dict) else text
-    return hashlib.sha256(normalized_text.encode("utf-8")).hexdigest()
+def _orjson_matches_json(payload: dict) -> bool:
+    # orjson writes 1e16 / 0.00001 / null where json writes 1e+16 / 1e-05 / NaN,
+    # so floats outside the plain-decimal range (and nested values, which
+    # aren't checked here) go through json to keep existing keys stable.
+    for v in payload.values():
+        if type(v) is float:
+            a = abs(v)
+            if a != 0.0 and not 1e-4 <= a < 1e16:
+                return False
+        elif isinstance(v, (dict, list, tuple)):
+            return False
+    return True
+
+
+def normalize_for_hash(payload: dict) -> bytes:
+    if _orjson_matches_json(payload):
+        try:
+            data = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        except orjson.JSONEncodeError:
+            data = None  # e.g. ints beyond 64 bits or non-str keys
+        # orjson emits raw UTF-8 (and a raw DEL, 0x7f) where json escapes to
+        # \uXXXX; keep the escaped form so keys already stored for those
+        # payloads still match. Every other ASCII byte is written the same way.
+        if data is not None and data.isascii() and b"\x7f" not in data:
+            return data
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("ascii")
+
+
+# The same payload is usually hashed several times in one request
+# (cache lookup -> cache write, or a re-imported statement), so memoize
+# the digest on the normalized bytes.
+@lru_cache(maxsize=4096)
+def _digest(data: bytes) -> bytes:
+    return _sha256(data, usedforsecurity=False).digest()
+
+
+def hash(text: str | bytes | dict) -> str:
+    if isinstance(text, dict):
+        text = normalize_for_hash(text)
+    return _digest(text if isinstance(text, bytes) else text.encode("utf-8")).hex()
+
+
+def tx_digest(payload: dict) -> bytes:
+    """
+    Raw 32-byte SHA-256 of the normalized payload (binary expense/cache keys);
+    hash() of a dict payload is its hex form.
+    """
+    return _digest(normalize_for_hash(payload))
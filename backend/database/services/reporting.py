@@ -1,5 +1,7 @@
 from enum import Enum
-from sqlalchemy import and_, select, func
+from functools import lru_cache
+from sqlalchemy import bindparam, select, func
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 from database.tables import Expense, Category
 
@@ -9,59 +11,62 @@ class ResultOrder(Enum):
     ASC = "asc"
 
 
+@lru_cache(maxsize=None)
+def _totals_stmt(
+    include_zero: bool, only_active: bool | None, order: ResultOrder, paged: bool
+):
+    """
+    Built once per shape; the date range (and page) are bind parameters, so
+    repeat calls only bind values and reuse the compiled SQL.
+    """
+    # Aggregate expenses per category first (a covering scan of the
+    # (category_id, date, amount) index), then attach category labels.
+    totals = (
+        select(
+            Expense.category_id,
+            (func.sum(Expense.amount_cents) / 100.0).label("total"),
+        )
+        .where(Expense.date.between(bindparam("start"), bindparam("end")))
+        .group_by(Expense.category_id)
+        .cte("totals")
+    )
+    total_expr = func.coalesce(totals.c.total, 0.0).label("total")
+    stmt = select(
+        Category.id.label("category_id"),
+        Category.name.label("category_name"),
+        Category.is_active.label("is_active"),
+        total_expr,
+    ).join(totals, totals.c.category_id == Category.id, isouter=include_zero)
+    if only_active is not None:
+        stmt = stmt.where(Category.is_active.is_(only_active))
+    stmt = (
+        stmt.order_by(total_expr.desc(), Category.name.desc())
+        if order == ResultOrder.DESC
+        else stmt.order_by(total_expr.asc(), Category.name.asc())
+    )
+    if paged:
+        stmt = stmt.limit(bindparam("limit")).offset(bindparam("offset"))
+    return stmt
+
+
 def totals_by_category(
-    s: Session,
+    s: Session | Connection,
     start_date,
     end_date,
     *,
-    only_active: bool = True,
+    only_active: bool | None = True,
     include_zero: bool = False,
-    order: ResultOrder = ResultOrder.DESC,
+    order: ResultOrder | str = ResultOrder.DESC,
     limit: int | None = None,
     offset: int = 0,
 ) -> list[dict]:
-    total_expr = func.coalesce(func.sum(Expense.amount), 0.0).label("total")
-    if include_zero:
-        j = Category.__table__.outerjoin(
-            Expense.__table__,
-            and_(
-                Expense.category_id == Category.id,
-                Expense.date.between(start_date, end_date),
-            ),
-        )
-        stmt = select(
-            Category.id.label("category_id"),
-            Category.name.label("category_name"),
-            Category.is_active.label("is_active"),
-            total_expr,
-        ).select_from(j)
-    else:
-        stmt = (
-            select(
-                Category.id.label("category_id"),
-                Category.name.label("category_name"),
-                Category.is_active.label("is_active"),
-                total_expr,
-            )
-            .join(Expense, Expense.category_id == Category.id)
-            .where(Expense.date.between(start_date, end_date))
-        )
-    stmt = stmt.where(Category.is_active.is_(only_active))
-    stmt = stmt.group_by(Category.id, Category.name, Category.is_active)
-    stmt = (
-        stmt.order_by(total_expr.desc(), Category.name.desc())
-        if order == ResultOrder.DESC
-        else stmt.order_by(total_expr.asc(), Category.name.asc())
+    # Tool calls pass "asc"/"desc" strings
+    stmt = _totals_stmt(
+        include_zero, only_active, ResultOrder(order), limit is not None
     )
+    params = {"start": start_date, "end": end_date}
     if limit is not None:
-        stmt = stmt.limit(limit).offset(offset)
-    rows = s.execute(stmt).all()
-    return [
-        {
-            "category_id": r.category_id,
-            "category_name": r.category_name,
-            "is_active": bool(r.is_active),
-            "total": float(r.total or 0.0),
-        }
-        for r in rows
-    ]
+        params.update(limit=limit, offset=offset)
+    # Labels match the output keys; Boolean/Float columns already come back
+    # as bool/float, so rows need no per-field conversion.
+    return [dict(m) for m in s.execute(stmt, params).mappings()]
@@ -2,8 +2,10 @@
 from __future__ import annotations
 
 from sqlalchemy.orm import Session
-from database.repos.categories import CategoryRepo
+from database.repos.categories import CategoryRepo, name_key
 from database.repos.expenses import ExpenseRepo
+from database.services.hashing import tx_digest
+from database.tables import to_cents
 
 
 def save_expenses(
@@ -11,6 +13,8 @@ def save_expenses(
     items: list[dict],
     *,
     dedupe_on_hash: bool = True,
+    known_ids: dict[str, int] | None = None,
+    other_id: int | None = None,
 ) -> list[int]:
     """
     Persist multiple expenses within a single session/transaction.
@@ -22,34 +26,60 @@ def save_expenses(
       - category_id: Optional[int]
       - category: Optional[str]  (used if category_id missing)
 
-    Returns inserted (or deduped) row ids in order.
+    known_ids (name_key(name) -> id) and other_id are already-known ids, e.g. the
+    Database's category cache; only names missing from it are queried.
+
+    Returns inserted (or deduped) row ids in order. Raises ValueError (before
+    writing anything) if a category_id doesn't exist.
     """
     cat_repo = CategoryRepo(s)
-    exp_repo = ExpenseRepo(s)
-    other_id = cat_repo.get_or_create_other()
-    inserted: list[int] = []
+    if other_id is None:
+        other_id = cat_repo.get_or_create_other()
+    known_ids = known_ids or {}
+    # Resolve every distinct uncached category name in one query
+    names = {
+        name_key(item["category"])
+        for item in items
+        if item.get("category_id") is None and item.get("category")
+    } - known_ids.keys()
+    cat_ids = cat_repo.resolve_ids_bulk(names, other_id) if names else {}
+    cat_ids.update(known_ids)
+    # Explicit ids must name a stored category (expenses.category_id is a
+    # foreign key); only ids missing from known_ids are checked in SQL.
+    explicit = {
+        int(item["category_id"])
+        for item in items
+        if item.get("category_id") is not None
+    }
+    unchecked = explicit - set(known_ids.values()) - {other_id}
+    if unchecked:
+        unknown = sorted(unchecked - cat_repo.existing_ids(unchecked))
+        if unknown:
+            raise ValueError(f"Unknown category_id: {', '.join(map(str, unknown))}")
+    rows: list[dict] = []
     for item in items:
         if item.get("category_id") is not None:
             cat_id = int(item["category_id"])
         elif item.get("category"):
-            cat_id = cat_repo.resolve_id(item["category"], fallback_other_id=other_id)
+            cat_id = cat_ids[name_key(item["category"])]
         else:
             cat_id = other_id
+        amount = float(item["amount"])
         raw = {
             "date": item["date"].isoformat(),
             "description": item["description"],
-            "amount": float(item["amount"]),
+            "amount": amount,
             "category": item.get("category"),
             "category_id": cat_id,
         }
-        new_id = exp_repo.add(
-            date=item["date"],
-            amount=float(item["amount"]),
-            description=item["description"],
-            category_id=cat_id,
-            raw=raw,
-            dedupe_on_hash=dedupe_on_hash,
+        rows.append(
+            {
+                "date": item["date"],
+                "amount_cents": to_cents(amount),
+                "description": item["description"] or "",
+                "category_id": cat_id,
+                "hash": tx_digest(raw),
+            }
         )
-        inserted.append(new_id)
 
-    return inserted
+    return ExpenseRepo(s).add_many(rows, dedupe_on_hash=dedupe_on_hash)
@@ -0,0 +1,111 @@
+import logging
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+from database.tables import Base, Category, ClassificationCache, Expense, to_cents
+
+logger = logging.getLogger(__name__)
+
+# Indexes the models no longer declare; dropped from existing files.
+RETIRED_INDEXES = ("ix_expenses_category_date",)
+
+
+def ensure_indexes(engine: Engine) -> None:
+    """
+    create_all() only builds indexes together with a new table, so add any
+    index declared after an existing database file was created; drop the ones
+    listed in RETIRED_INDEXES.
+    """
+    with engine.begin() as conn:
+        for name in RETIRED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        merge_case_duplicate_categories(conn)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except IntegrityError:
+                # A unique index existing rows still violate; run without it
+                # rather than refuse to start.
+                logger.warning(
+                    "Skipped unique index %s: existing rows violate it", index.name
+                )
+
+
+def merge_case_duplicate_categories(conn: Connection) -> None:
+    """
+    Fold categories whose names differ only in case into the oldest one (lowest
+    id), so the unique lower(name) index can be built on files that predate it.
+    """
+    keep: dict[str, int] = {}
+    merged: dict[int, int] = {}
+    for cat_id, name in conn.execute(
+        select(Category.id, func.lower(Category.name)).order_by(Category.id)
+    ):
+        if name in keep:
+            merged[cat_id] = keep[name]
+        else:
+            keep[name] = cat_id
+    if not merged:
+        return
+    for table in (Expense, ClassificationCache):
+        for old_id, new_id in merged.items():
+            conn.execute(
+                update(table)
+                .where(table.category_id == old_id)
+                .values(category_id=new_id)
+            )
+    conn.execute(delete(Category).where(Category.id.in_(merged)))
+    logger.warning("Merged %d case-duplicate categories", len(merged))
+
+
+# (table, column) pairs that now store the raw 32-byte digest
+_DIGEST_COLUMNS = (("classification_cache", "hash"), ("expenses", "hash"))
+
+
+def convert_hex_keys(engine: Engine) -> None:
+    """
+    Digest keys used to be 64-char hex strings; rewrite any left in an
+    existing SQLite file into the raw 32-byte digest. SQLite's dynamic typing
+    lets the old VARCHAR columns hold the BLOBs.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for table, column in _DIGEST_COLUMNS:
+            legacy = conn.scalars(
+                text(f"SELECT {column} FROM {table} WHERE typeof({column}) = 'text'")
+            ).all()
+            if legacy:
+                conn.execute(
+                    text(f"UPDATE {table} SET {column} = :new WHERE {column} = :old"),
+                    [{"new": bytes.fromhex(h), "old": h} for h in legacy],
+                )
+
+
+# PRAGMA user_version once expenses.amount holds integer cents
+AMOUNT_CENTS_VERSION = 1
+
+
+def convert_amounts_to_cents(engine: Engine) -> None:
+    """
+    expenses.amount used to hold float currency units; rewrite an existing
+    SQLite file's rows into integer cents, once (tracked via user_version).
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+        if version >= AMOUNT_CENTS_VERSION:
+            return
+        # Rounded in Python with to_cents, the rule new rows are stored with
+        rows = conn.exec_driver_sql("SELECT id, amount FROM expenses").all()
+        if rows:
+            conn.execute(
+                text("UPDATE expenses SET amount = :cents WHERE id = :id"),
+                [{"cents": to_cents(amount), "id": row_id} for row_id, amount in rows],
+            )
+        conn.exec_driver_sql(f"PRAGMA user_version = {AMOUNT_CENTS_VERSION}")
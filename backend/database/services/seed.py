@@ -1,8 +1,9 @@
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from database.engine import insert_for
 from database.tables import Category
 
-DEFAULT_SEED = [
+DEFAULT_SEED = (
     ("groceries", "Supermarkets & food stores"),
     ("restaurants", "Dining & take-away"),
     ("transportation", "Taxis, rideshare, public transit"),
@@ -13,14 +14,25 @@ DEFAULT_SEED = [
     ("shopping", "Retail & online shopping"),
     ("subscriptions", "Recurring services and memberships"),
     ("other", "Everything else / fallback"),
-]
+)
 
 
 def ensure_seed(s: Session, seed=DEFAULT_SEED):
-    existing = set(n.lower() for n in s.scalars(select(Category.name)).all())
-    to_add = [
-        Category(name=n, description=d) for n, d in seed if n.lower() not in existing
-    ]
-    if to_add:
-        s.add_all(to_add)
-        s.commit()
+    # Every start after the first: all seed names are already present, skip
+    # the write
+    present = s.scalar(
+        select(func.count())
+        .select_from(Category)
+        .where(func.lower(Category.name).in_([n.lower() for n, _ in seed]))
+    )
+    if present >= len(seed):
+        return
+    # One INSERT for the whole seed; names already present (in any case) hit
+    # the unique lower(name) index and are skipped by the database.
+    stmt = (
+        insert_for(s, Category)
+        .values([{"name": n, "description": d} for n, d in seed])
+        .on_conflict_do_nothing(index_elements=[func.lower(Category.name)])
+    )
+    s.execute(stmt)
+    s.commit()
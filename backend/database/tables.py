@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone, date as DateOnly
+from decimal import ROUND_HALF_UP, Decimal
 
 from sqlalchemy import (
     Boolean,
@@ -11,9 +12,10 @@ from sqlalchemy import (
     String,
     Text,
     Index,
-    Float,
-    UniqueConstraint,
+    LargeBinary,
+    func,
 )
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import (
     Mapped,
     mapped_column,
@@ -27,6 +29,15 @@ def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+_CENT = Decimal(1)
+
+
+def to_cents(amount: float) -> int:
+    # Decimal of the shortest repr, rounded half-up: 2.205 -> 221, where
+    # round(2.205 * 100) gives 220. Inserts and the cents migration share it.
+    return int(Decimal(str(amount)).scaleb(2).quantize(_CENT, ROUND_HALF_UP))
+
+
 Base = declarative_base()
 
 
@@ -46,25 +57,34 @@ class Category(Base):
         DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False
     )
 
-    # reverse side of relationship (renamed from cached_transactions)
+    # Navigation only: writes go through Expense.category_id and deletes are
+    # guarded by the FK (ON DELETE RESTRICT), so no cascade bookkeeping.
+    # Lazy loads raise to keep N+1 queries from sneaking in.
     expenses: Mapped[list["Expense"]] = relationship(
-        back_populates="category", cascade="all, delete-orphan", passive_deletes=True
+        back_populates="category", viewonly=True, lazy="raise_on_sql"
     )
 
     def __repr__(self) -> str:
         return f"Category(id={self.id}, name={self.name!r}, active={self.is_active})"
 
 
+# Case-insensitive name lookups compare lower(name) so they can seek this index;
+# unique so "Food" and "food" can't both exist (and seeding can rely on it).
+Index("ix_categories_name_lower", func.lower(Category.name), unique=True)
+
+
 class Expense(Base):
     __tablename__ = "expenses"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
     # Common analytics fields promoted out of JSON
-    date: Mapped[DateOnly] = mapped_column(Date, nullable=False, index=True)
-    amount: Mapped[float] = mapped_column(
-        Float, nullable=False, index=True
-    )  # use cents(int) if you prefer exactness
+    date: Mapped[DateOnly] = mapped_column(Date, nullable=False)
+    # Integer cents (exact sums); `amount` is the float view of it. The DB
+    # column keeps its name so existing files need no table rebuild.
+    amount_cents: Mapped[int] = mapped_column(
+        "amount", Integer, nullable=False, index=True
+    )
     description: Mapped[str] = mapped_column(Text, default="", nullable=False)
 
     # Category link
@@ -76,30 +96,64 @@ class Expense(Base):
     )
 
     # For dedupe (based on normalized raw/fields). Keep unique if you like idempotency.
-    hash: Mapped[str | None] = mapped_column(String(64), unique=True, index=True)
+    # Raw SHA-256 digest (32 bytes; half the size of the former hex string).
+    hash: Mapped[bytes | None] = mapped_column(LargeBinary(32), unique=True, index=True)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=utcnow, nullable=False
     )
 
-    category: Mapped["Category"] = relationship(back_populates="expenses")
+    category: Mapped["Category"] = relationship(
+        back_populates="expenses", viewonly=True, lazy="raise_on_sql"
+    )
+
+    @hybrid_property
+    def amount(self) -> float:
+        return self.amount_cents / 100
+
+    @amount.inplace.expression
+    @classmethod
+    def _amount_expression(cls):
+        return cls.amount_cents / 100.0
 
     def __repr__(self) -> str:
         return f"Expense(id={self.id}, date={self.date}, amount={self.amount}, category_id={self.category_id})"
 
 
-# Helpful indexes for exploration/analytics
-Index("ix_expenses_category_date", Expense.category_id, Expense.date.desc())
-Index("ix_expenses_category_amount", Expense.category_id, Expense.amount.desc())
+# Date-range scans (between / list_recent). On SQLite entries already end with
+# the rowid, so ORDER BY date, id needs no sort; on PostgreSQL the INCLUDE
+# columns make between() an index-only scan.
+Index(
+    "ix_expenses_date",
+    Expense.date,
+    postgresql_include=["id", "amount", "description", "category_id"],
+)
+# list_recent's ORDER BY date DESC, amount DESC, id DESC is a backward scan of
+# this index, so a page is LIMIT rows read in order instead of a sort (with
+# `since`, a range on its date prefix).
+Index("ix_expenses_date_amount_id", Expense.date, Expense.amount_cents, Expense.id)
+# Helpful indexes for exploration/analytics.
+# (category_id, date, amount) covers per-category range sums: amount is read
+# from the index without touching the table. It replaces the former
+# (category_id, date DESC) index, which it serves every lookup of.
+Index(
+    "ix_expenses_category_date_amount",
+    Expense.category_id,
+    Expense.date,
+    Expense.amount_cents,
+)
+Index("ix_expenses_category_amount", Expense.category_id, Expense.amount_cents.desc())
 
 
 class ClassificationCache(Base):
     __tablename__ = "classification_cache"
-    # hash of the normalized tx payload
-    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # raw SHA-256 digest of the normalized tx payload
+    hash: Mapped[bytes] = mapped_column(LargeBinary(32), primary_key=True)
     category_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=utcnow, nullable=False
     )
 
-    __table_args__ = (UniqueConstraint("hash", name="uq_classification_cache_hash"),)
+    # WITHOUT ROWID: the PK B-tree stores category_id inline, so a lookup by
+    # hash is a single index-only descent (applies to newly created files).
+    __table_args__ = {"sqlite_with_rowid": False}
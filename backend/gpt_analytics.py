@@ -1,20 +1,16 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date as DateOnly, datetime
-import os
-import json
+
+import orjson
 
 from openai import OpenAI  # pip install openai
 from database.database import Database
 from database.services.reporting import ResultOrder
-from gpt_classifier import OPENAI_API_KEY_FILE, DEFAULT_MODEL
+from gpt_classifier import DEFAULT_MODEL, load_api_key
 # --- Model & client ---
 
-if not os.getenv(OPENAI_API_KEY_FILE) and os.path.exists(OPENAI_API_KEY_FILE.lower()):
-    with open(OPENAI_API_KEY_FILE.lower(), "r") as f:
-        os.environ[OPENAI_API_KEY_FILE] = f.read().strip()
-
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+client = OpenAI(api_key=load_api_key())
 
 # --- Helpers ---
 def _iso_date(s: str) -> DateOnly:
@@ -32,6 +28,15 @@ def _serialize(obj: any) -> any:
 @dataclass
 class ReadonlyDBTools:
     db: Database
+    # One instance per ask and nothing here writes, so an aggregate asked for
+    # twice with the same arguments (e.g. across tool rounds) is answered from
+    # memory instead of re-running the SQL.
+    _memo: dict[tuple, any] = field(default_factory=dict, repr=False)
+
+    def _memoized(self, key: tuple, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
 
     # 1) list recent expenses
     def list_expenses(self, limit: int = 50, offset: int = 0, since: str | None = None) -> list[dict]:
@@ -57,7 +62,20 @@ class ReadonlyDBTools:
     # 3) Sum for a single category
     def sum_for_category_between(self, category: str | int, start_date: str, end_date: str) -> float:
         sd, ed = _iso_date(start_date), _iso_date(end_date)
-        return float(self.db.sum_for_category_between(category, sd, ed))
+        return self._memoized(
+            ("sum_for_category_between", category, sd, ed),
+            lambda: float(self.db.sum_for_category_between(category, sd, ed)),
+        )
+
+    # 3b) Sums for several categories in one call
+    def sum_for_categories_between(self, categories: list[str | int], start_date: str, end_date: str) -> dict[str, float]:
+        sd, ed = _iso_date(start_date), _iso_date(end_date)
+        sums = self._memoized(
+            ("sum_for_categories_between", tuple(categories), sd, ed),
+            lambda: self.db.sum_for_categories_between(categories, sd, ed),
+        )
+        # JSON object keys are strings
+        return {str(c): float(v) for c, v in sums.items()}
 
     # 4) Totals by category
     def totals_by_category(
@@ -71,9 +89,12 @@ class ReadonlyDBTools:
         offset: int = 0,
     ) -> list[dict]:
         sd, ed = _iso_date(start_date), _iso_date(end_date)
-        return self.db.totals_by_category(
-            sd, ed, only_active=only_active, include_zero=include_zero,
-            order=order, limit=limit, offset=offset
+        return self._memoized(
+            ("totals_by_category", sd, ed, only_active, include_zero, ResultOrder(order), limit, offset),
+            lambda: self.db.totals_by_category(
+                sd, ed, only_active=only_active, include_zero=include_zero,
+                order=order, limit=limit, offset=offset
+            ),
         )
 
     # 5) Category name helper (metadata only)
@@ -90,6 +111,8 @@ def _call_tool(tools: ReadonlyDBTools, name: str, arguments: dict[str, any]) ->
         return tools.get_expenses_between(**arguments)
     if name == "sum_for_category_between":
         return tools.sum_for_category_between(**arguments)
+    if name == "sum_for_categories_between":
+        return tools.sum_for_categories_between(**arguments)
     if name == "totals_by_category":
         return tools.totals_by_category(**arguments)
     if name == "get_active_category_names_with_other":
@@ -141,6 +164,20 @@ FUNCTIONS = [
             "additionalProperties": False,
         },
     },
+    {
+        "name": "sum_for_categories_between",
+        "description": "Sum of amounts for each of several categories within a date range, in one call.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "categories": {"type": "array", "items": {"oneOf": [{"type": "integer"}, {"type": "string"}]}, "minItems": 1},
+                "start_date": {"type": "string", "description": "YYYY-MM-DD"},
+                "end_date": {"type": "string", "description": "YYYY-MM-DD"},
+            },
+            "required": ["categories", "start_date", "end_date"],
+            "additionalProperties": False,
+        },
+    },
     {
         "name": "totals_by_category",
         "description": "Per-category totals within a date range.",
@@ -205,7 +242,7 @@ def ask_expenses(db: Database, user_prompt: str) -> Dict[str, Any]:
 
         for tc in msg.tool_calls:
             name = tc.function.name
-            args = json.loads(tc.function.arguments or "{}")
+            args = orjson.loads(tc.function.arguments or "{}")
             result = _call_tool(tools_impl, name, args)
             tools_used.append(name)
             data_map[name] = result
@@ -214,7 +251,7 @@ def ask_expenses(db: Database, user_prompt: str) -> Dict[str, Any]:
                 "role": "tool",
                 "tool_call_id": tc.id,
                 "name": name,
-                "content": json.dumps({"ok": True, "result": result}, default=_serialize),
+                "content": orjson.dumps({"ok": True, "result": result}, default=_serialize).decode(),
             })
 
         # 3) Force a textual answer
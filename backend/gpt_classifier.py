@@ -1,11 +1,288 @@
+import asyncio
+import importlib.util
 import os
-import json
+import random
+import time
+from functools import lru_cache
+from typing import AsyncIterator
 
+import httpx2  # HTTP client library the openai SDK is built on
 import openai
+import orjson
 from database.database import Database
 
 DEFAULT_MODEL = "gpt-4.1-mini"
 OPENAI_API_KEY_FILE = "OPENAI_API_KEY"
+# Async model calls: at most this many in flight, and paced to the account's
+# requests-per-minute limit so a large batch doesn't end in 429s.
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_RPM = 500
+# Tries per request when the API answers 429 (exponential backoff in between)
+RATE_LIMIT_ATTEMPTS = 5
+# Connection pool of the async client: idle connections are kept for a minute
+# (the SDK default is 5s) so batches a few seconds apart skip new TLS handshakes.
+ASYNC_HTTP_LIMITS = httpx2.Limits(
+    max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0
+)
+ASYNC_HTTP_TIMEOUT = httpx2.Timeout(30.0, connect=5.0)
+# HTTP/2 (concurrent requests multiplexed over one TLS connection) when the
+# optional h2 package is installed; HTTP/1.1 otherwise.
+ASYNC_HTTP2 = importlib.util.find_spec("h2") is not None
+# Longest the startup connection warm-up (aconnect) may take
+CONNECT_WARMUP_TIMEOUT = 5.0
+
+
+# Categories are listed once, numbered, and the answer is the number: the
+# names aren't repeated as a schema enum and the reply is a short integer.
+# Numbers are list positions unless given (offline jobs use category ids).
+def _numbered(categories: tuple[str, ...], numbers: tuple[int, ...] | None) -> str:
+    return "\n".join(
+        f"{i}: {c}" for i, c in zip(numbers or range(len(categories)), categories)
+    )
+
+
+# Prompt and output schema depend only on the category list, which changes
+# rarely, so each is built once per distinct list (schemas: per length).
+# `numbers` is keyword-only and always passed, so every caller shares one
+# lru_cache key per list.
+@lru_cache(maxsize=8)
+def _system_prompt(
+    categories: tuple[str, ...], *, numbers: tuple[int, ...] | None
+) -> str:
+    return (
+        "Classify the bank transaction into exactly ONE of the allowed categories. "
+        "Choose ONLY from the provided list. If unsure, pick the closest match. "
+        "Answer with the category's number.\n\n"
+        "Allowed categories:\n" + _numbered(categories, numbers)
+    )
+
+
+# Structured output (strict JSON schema) instead of a forced tool call: the
+# reply is the JSON object itself, with no tool-call envelope to generate.
+@lru_cache(maxsize=8)
+def _response_format(count: int, *, numbers: tuple[int, ...] | None) -> dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "transaction_category",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "category_id": {
+                        "type": "integer",
+                        "enum": list(numbers or range(count)),
+                    }
+                },
+                "required": ["category_id"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+# OpenAI Batch API jobs (half the token price, answered within the window)
+BATCH_JOB_ENDPOINT = "/v1/chat/completions"
+BATCH_JOB_COMPLETION_WINDOW = "24h"
+
+# Transactions go to the model as JSON arrays of these fields, named once in
+# the message instead of repeating the keys in every transaction's object.
+TX_FIELDS = ("date", "description", "amount")
+_TX_HEADER = ", ".join(TX_FIELDS)
+
+
+def _tx_row(tx: dict) -> str:
+    return orjson.dumps([tx.get(f) for f in TX_FIELDS]).decode()
+
+
+# Cache misses per model request in batch classification: the prompt and
+# category list are sent once for BATCH_SIZE transactions.
+BATCH_SIZE = 20
+
+
+@lru_cache(maxsize=8)
+def _batch_system_prompt(categories: tuple[str, ...]) -> str:
+    return (
+        "Classify each numbered bank transaction into exactly ONE of the allowed "
+        "categories. Choose ONLY from the provided list. If unsure, pick the "
+        "closest match. Return one result per transaction index, with the "
+        "category's number.\n\n"
+        "Allowed categories:\n" + _numbered(categories, None)
+    )
+
+
+@lru_cache(maxsize=8)
+def _batch_response_format(count: int) -> dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "transaction_categories",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "results": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "index": {"type": "integer"},
+                                "category_id": {
+                                    "type": "integer",
+                                    "enum": list(range(count)),
+                                },
+                            },
+                            "required": ["index", "category_id"],
+                            "additionalProperties": False,
+                        },
+                    }
+                },
+                "required": ["results"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+class RequestLimiter:
+    """
+    Concurrency cap plus a token bucket refilled at max_rpm per minute
+    (bursts of up to max_concurrency). The asyncio primitives are created
+    on first use in each event loop, as they belong to the loop they run in.
+    """
+
+    def __init__(self, max_concurrency: int, max_rpm: int):
+        self.max_concurrency = max_concurrency
+        self.rate = max_rpm / 60.0  # tokens per second
+        self._tokens = float(max_concurrency)
+        self._last_refill = time.monotonic()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._sem: asyncio.Semaphore | None = None
+        self._lock: asyncio.Lock | None = None
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            self._lock = asyncio.Lock()
+
+    async def _acquire_token(self) -> None:
+        # Waiters queue on the lock, so tokens are handed out in order.
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                float(self.max_concurrency),
+                self._tokens + (now - self._last_refill) * self.rate,
+            )
+            self._last_refill = now
+            if self._tokens < 1.0:
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+                self._last_refill = time.monotonic()
+                self._tokens = 0.0
+            else:
+                self._tokens -= 1.0
+
+    async def run(self, make_call):
+        """Await make_call() within the limits, retrying on rate-limit errors."""
+        self._bind()
+        async with self._sem:
+            for attempt in range(RATE_LIMIT_ATTEMPTS):
+                await self._acquire_token()
+                try:
+                    return await make_call()
+                except openai.RateLimitError:
+                    if attempt == RATE_LIMIT_ATTEMPTS - 1:
+                        raise
+                    await asyncio.sleep(2**attempt + random.random())
+
+
+# /classify coalescing: small requests arriving within BATCHER_MAX_WAIT seconds
+# of each other share model calls, up to BATCHER_MAX_ITEMS transactions.
+BATCHER_MAX_ITEMS = 64
+BATCHER_MAX_WAIT = 0.02
+
+
+class ClassifyBatcher:
+    """
+    Merges concurrent submit() calls into one classify_batch(txs) call (e.g.
+    GPTClassifier.aclassify_batch) and hands each caller its slice of the ids.
+    The first submission opens a window of max_wait seconds; it closes early
+    once max_items transactions are waiting. Create it inside the event loop
+    it is used from.
+    """
+
+    def __init__(
+        self,
+        classify_batch,
+        max_items: int = BATCHER_MAX_ITEMS,
+        max_wait: float = BATCHER_MAX_WAIT,
+    ):
+        self.classify_batch = classify_batch
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self._pending: list[tuple[list[dict], asyncio.Future]] = []
+        self._pending_count = 0
+        self._timer: asyncio.TimerHandle | None = None
+        # Running flushes (the loop only keeps weak references to tasks)
+        self._flushes: set[asyncio.Task] = set()
+
+    async def submit(self, txs: list[dict]) -> list[int]:
+        if len(txs) >= self.max_items:
+            # Already a full batch; classify_batch chunks it itself
+            return await self.classify_batch(txs)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((txs, fut))
+        self._pending_count += len(txs)
+        if self._pending_count >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._pending_count = self._pending, [], 0
+        if pending:
+            task = asyncio.ensure_future(self._run(pending))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _run(self, pending: list[tuple[list[dict], asyncio.Future]]) -> None:
+        merged = [tx for txs, _ in pending for tx in txs]
+        try:
+            ids = await self.classify_batch(merged)
+        except Exception as e:
+            for _, fut in pending:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        start = 0
+        for txs, fut in pending:
+            # A caller that went away (cancelled) has a done future
+            if not fut.done():
+                fut.set_result(ids[start : start + len(txs)])
+            start += len(txs)
+
+    async def aclose(self) -> None:
+        """Flush what is waiting and wait for running batches to finish."""
+        self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+
+# API key from the environment, else from the key file. Read once per path
+# per process, and passed to the clients instead of written to os.environ.
+@lru_cache(maxsize=None)
+def load_api_key(filepath: str = OPENAI_API_KEY_FILE.lower()) -> str | None:
+    key = os.environ.get(OPENAI_API_KEY_FILE)
+    if not key and os.path.exists(filepath):
+        with open(filepath, "r") as f:
+            key = f.read().strip()
+    return key
 
 
 class GPTClassifier:
@@ -13,25 +290,60 @@ class GPTClassifier:
         self,
         db: Database | None = None,
         client: openai.OpenAI | None = None,
+        aclient: openai.AsyncOpenAI | None = None,
         model: str = DEFAULT_MODEL,
         api_key_filepath: str = OPENAI_API_KEY_FILE.lower(),  # e.g. "openai_api_key"
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_rpm: int = DEFAULT_MAX_RPM,
     ):
         self.db = db or Database()
-        self._load_api_key_from_file(api_key_filepath)
-        self.client = client or openai.OpenAI(
-            api_key=os.environ.get(OPENAI_API_KEY_FILE)
+        api_key = load_api_key(api_key_filepath)
+        self.client = client or openai.OpenAI(api_key=api_key)
+        # Used by aclassify_batch to run the model calls of a batch concurrently
+        self._owns_aclient = aclient is None
+        self.aclient = aclient or openai.AsyncOpenAI(
+            api_key=api_key,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=ASYNC_HTTP_LIMITS,
+                timeout=ASYNC_HTTP_TIMEOUT,
+                http2=ASYNC_HTTP2,
+            ),
         )
         self.model = model
+        self._limiter = RequestLimiter(max_concurrency, max_rpm)
 
-    # Load api key from file if not in env
-    def _load_api_key_from_file(self, filepath: str) -> None:
-        if not os.getenv(OPENAI_API_KEY_FILE) and os.path.exists(filepath):
-            with open(filepath, "r") as f:
-                os.environ[OPENAI_API_KEY_FILE] = f.read().strip()
+    async def aclose(self) -> None:
+        """Close the async client's pooled connections (if this instance made it)."""
+        if self._owns_aclient:
+            await self.aclient.close()
 
     # Cache fast path
-    def _lookup_cache(self, tx: dict) -> int | None:
-        return self.db.cache_lookup(tx)
+    def _lookup_cache(self, tx: dict, key: bytes | None = None) -> int | None:
+        return self.db.cache_lookup(tx, key=key)
+
+    def warm_up(self) -> None:
+        """
+        Load the category list (into the Database's TTL cache) and build the
+        prompts/schemas for it, so the first request doesn't pay for them.
+        """
+        names = tuple(self._fetch_categories_with_other()[0])
+        _system_prompt(names, numbers=None)
+        _response_format(len(names), numbers=None)
+        _batch_system_prompt(names)
+        _batch_response_format(len(names))
+
+    async def aconnect(self) -> None:
+        """
+        Open a pooled connection to the API with one cheap models.list call,
+        so the first classification skips the TCP/TLS handshake. Best effort:
+        errors (offline, bad key) are left for the first real request.
+        """
+        try:
+            await self.aclient.with_options(
+                timeout=CONNECT_WARMUP_TIMEOUT, max_retries=0
+            ).models.list()
+        except Exception:
+            pass
 
     # Categories + ensure 'other'
     def _fetch_categories_with_other(self, limit: int = 50) -> tuple[list[str], int]:
@@ -39,107 +351,375 @@ class GPTClassifier:
 
     # Prompt builder
     def _build_system_prompt(self, categories: list[str]) -> str:
-        return (
-            "Classify the bank transaction into exactly ONE of the allowed categories. "
-            "Choose ONLY from the provided list. If unsure, pick the closest match.\n\n"
-            "Allowed categories:\n" + "\n".join(f"- {c}" for c in categories)
+        return _system_prompt(tuple(categories), numbers=None)
+
+    # Chat completion arguments for a single transaction; `numbers` replaces
+    # the list positions the model answers with
+    def _build_request(
+        self, tx: dict, categories: list[str], numbers: tuple[int, ...] | None = None
+    ) -> dict:
+        names = tuple(categories)
+        return dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": _system_prompt(names, numbers=numbers)},
+                {
+                    "role": "user",
+                    "content": f"Transaction ({_TX_HEADER}): {_tx_row(tx)}",
+                },
+            ],
+            response_format=_response_format(len(names), numbers=numbers),
+            temperature=0,
         )
 
-    # Model call using Tools API
-    def _request_model_choice(self, tx: dict, categories: list[str]) -> str:
-        system_prompt = self._build_system_prompt(categories)
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "categorize_transaction",
-                    "description": "Assign the transaction to one of the predefined categories.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "category": {"type": "string", "enum": categories}
-                        },
-                        "required": ["category"],
-                        "additionalProperties": False,
-                    },
+    def _build_batch_request(self, txs: list[dict], categories: list[str]) -> dict:
+        names = tuple(categories)
+        return dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": _batch_system_prompt(names)},
+                {
+                    "role": "user",
+                    "content": f"Transactions ({_TX_HEADER}):\n"
+                    + "\n".join(f"{i}: {_tx_row(tx)}" for i, tx in enumerate(txs)),
                 },
-            }
-        ]
+            ],
+            response_format=_batch_response_format(len(names)),
+            temperature=0,
+        )
 
+    # Model call with structured output; None if the call failed or the answer
+    # isn't one of `categories` (callers fall back to 'other' without caching)
+    def _request_model_choice(self, tx: dict, categories: list[str]) -> str | None:
         try:
             resp = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {
-                        "role": "user",
-                        "content": f"Transaction: {json.dumps(tx, separators=(',', ':'))}",
-                    },
-                ],
-                tools=tools,
-                tool_choice={
-                    "type": "function",
-                    "function": {"name": "categorize_transaction"},
-                },
-                temperature=0,
+                **self._build_request(tx, categories)
             )
         except Exception:
-            return "other"
+            return None
 
-        return self._extract_category_from_tool_calls(resp, categories) or "other"
+        return self._extract_category(resp, categories)
 
-    # Dedicated parser for tool calls
-    def _extract_category_from_tool_calls(
-        self, resp, categories: list[str]
+    async def _arequest_model_choice(
+        self, tx: dict, categories: list[str]
     ) -> str | None:
-        choices = getattr(resp, "choices", None) or []
-        if not choices:
+        try:
+            request = self._build_request(tx, categories)
+            resp = await self._limiter.run(
+                lambda: self.aclient.chat.completions.create(**request)
+            )
+        except Exception:
             return None
 
-        msg = getattr(choices[0], "message", None)
-        calls = getattr(msg, "tool_calls", None) or []
-        for call in calls:
-            if getattr(call, "type", None) != "function":
-                continue
-            fn = getattr(call, "function", None)
-            if not fn or getattr(fn, "name", None) != "categorize_transaction":
-                continue
+        return self._extract_category(resp, categories)
 
-            args_raw = getattr(fn, "arguments", None)
-            if isinstance(args_raw, dict):
-                args = args_raw
-            elif isinstance(args_raw, str):
-                try:
-                    args = json.loads(args_raw)
-                except Exception:
-                    continue
-            else:
-                continue
+    # One request for a slice of up to BATCH_SIZE transactions. Entries the
+    # answer doesn't resolve are asked again one transaction at a time; a
+    # failed call leaves the whole slice None.
+    def _request_model_choices(
+        self, txs: list[dict], categories: list[str]
+    ) -> list[str | None]:
+        try:
+            resp = self.client.chat.completions.create(
+                **self._build_batch_request(txs, categories)
+            )
+        except Exception:
+            return [None] * len(txs)
 
-            cat = args.get("category")
-            if isinstance(cat, str) and cat in categories:
-                return cat
+        chosen = self._extract_categories(resp, len(txs), categories)
+        for i, name in enumerate(chosen):
+            if name is None:
+                chosen[i] = self._request_model_choice(txs[i], categories)
+        return chosen
 
+    async def _arequest_model_choices(
+        self, txs: list[dict], categories: list[str]
+    ) -> list[str | None]:
+        try:
+            request = self._build_batch_request(txs, categories)
+            resp = await self._limiter.run(
+                lambda: self.aclient.chat.completions.create(**request)
+            )
+        except Exception:
+            return [None] * len(txs)
+
+        chosen = self._extract_categories(resp, len(txs), categories)
+        retry = [i for i, name in enumerate(chosen) if name is None]
+        answers = await asyncio.gather(
+            *(self._arequest_model_choice(txs[i], categories) for i in retry)
+        )
+        for i, name in zip(retry, answers):
+            chosen[i] = name
+        return chosen
+
+    # JSON object in the first choice's content (None on refusal/bad JSON)
+    def _response_payload(self, resp) -> dict | None:
+        try:
+            # None content (refusal) raises TypeError in orjson.loads
+            payload = orjson.loads(resp.choices[0].message.content)
+        except (AttributeError, IndexError, TypeError, orjson.JSONDecodeError):
+            return None
+        return payload if isinstance(payload, dict) else None
+
+    # Dedicated parser for the single-transaction schema
+    def _extract_category(self, resp, categories: list[str]) -> str | None:
+        payload = self._response_payload(resp)
+        if payload is None:
+            return None
+
+        return self._category_name(payload.get("category_id"), categories)
+
+    # Name for a returned category number, None if it isn't one of ours
+    def _category_name(self, cat_id, categories: list[str]) -> str | None:
+        if type(cat_id) is int and 0 <= cat_id < len(categories):
+            return categories[cat_id]
         return None
 
+    # Batch parser: one category per index, None where no valid one came back
+    # (left out, numbered outside `categories`, or an unparsable reply)
+    def _extract_categories(
+        self, resp, count: int, categories: list[str]
+    ) -> list[str | None]:
+        chosen: list[str | None] = [None] * count
+        payload = self._response_payload(resp)
+        results = payload.get("results") if payload else None
+        if not isinstance(results, list):
+            return chosen
+        for item in results:
+            if not isinstance(item, dict):
+                continue
+            idx = item.get("index")
+            cat = self._category_name(item.get("category_id"), categories)
+            if type(idx) is int and 0 <= idx < count and cat is not None:
+                chosen[idx] = cat
+        return chosen
+
     # Resolve + cache
     def _resolve_and_cache(
-        self, tx: dict, chosen_name: str, fallback_other_id: int
+        self,
+        tx: dict,
+        chosen_name: str,
+        fallback_other_id: int,
+        key: bytes | None = None,
     ) -> int:
         cat_id = self.db.resolve_category_id(
             chosen_name, fallback_other_id=fallback_other_id
         )
-        self.db.cache_write(tx, cat_id)
+        self.db.cache_write(tx, cat_id, key=key)
         return cat_id
 
     # Public API
     def classify(self, tx: dict) -> int:
-        cached = self._lookup_cache(tx)
+        key = self.db.cache_key(tx)  # hashed once for lookup and write
+        cached = self._lookup_cache(tx, key)
         if cached is not None:
             return cached
         categories, other_id = self._fetch_categories_with_other()
         chosen_name = self._request_model_choice(tx, categories)
-        return self._resolve_and_cache(tx, chosen_name, other_id)
+        if chosen_name is None:
+            return other_id
+        return self._resolve_and_cache(tx, chosen_name, other_id, key)
+
+    # One cache query for the whole batch; only misses go to the model, once
+    # per distinct key (repeats in the batch share the first one's answer).
+    # New answers are written back in one upsert at the end, so no write
+    # transaction is open while the model calls run.
+    def _lookup_batch(
+        self, txs: list[dict]
+    ) -> tuple[list[bytes], list[int | None], list[int]]:
+        keys = [self.db.cache_key(tx) for tx in txs]
+        results = self.db.cache_lookup_many(txs, keys=keys)
+        first_miss: dict[bytes, int] = {}
+        for i, cached in enumerate(results):
+            if cached is None:
+                first_miss.setdefault(keys[i], i)
+        return keys, results, list(first_miss.values())
+
+    def _store_batch_choices(
+        self,
+        txs: list[dict],
+        keys: list[bytes],
+        results: list[int | None],
+        misses: list[int],
+        chosen_names: list[str | None],
+        other_id: int,
+    ) -> None:
+        for i, chosen_name in zip(misses, chosen_names):
+            results[i] = (
+                other_id
+                if chosen_name is None
+                else self.db.resolve_category_id(
+                    chosen_name, fallback_other_id=other_id
+                )
+            )
+        # Fallbacks (failed call, no valid answer) answer 'other' but aren't
+        # cached, so the next request asks the model again
+        answered = [i for i, name in zip(misses, chosen_names) if name is not None]
+        self.db.cache_write_many(
+            [(txs[i], results[i]) for i in answered],
+            keys=[keys[i] for i in answered],
+        )
+        by_key = {keys[i]: results[i] for i in misses}
+        for i, cat_id in enumerate(results):
+            if cat_id is None and keys[i] in by_key:
+                results[i] = by_key[keys[i]]
+
+    @staticmethod
+    def _chunks(items: list) -> list[list]:
+        return [items[i : i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
 
     def classify_batch(self, txs: list[dict]) -> list[int]:
-        return [self.classify(tx) for tx in txs]
+        keys, results, misses = self._lookup_batch(txs)
+        if misses:
+            categories, other_id = self._fetch_categories_with_other()
+            chosen_names = [
+                name
+                for chunk in self._chunks([txs[i] for i in misses])
+                for name in self._request_model_choices(chunk, categories)
+            ]
+            self._store_batch_choices(
+                txs, keys, results, misses, chosen_names, other_id
+            )
+        return results
+
+    async def aclassify_batch(self, txs: list[dict]) -> list[int]:
+        """classify_batch with the model calls for all misses in flight at once."""
+        # Database calls block, so they run on a worker thread to keep the
+        # event loop free for other requests.
+        keys, results, misses = await asyncio.to_thread(self._lookup_batch, txs)
+        if misses:
+            categories, other_id = await asyncio.to_thread(
+                self._fetch_categories_with_other
+            )
+            # gather keeps input order
+            per_chunk = await asyncio.gather(
+                *(
+                    self._arequest_model_choices(chunk, categories)
+                    for chunk in self._chunks([txs[i] for i in misses])
+                )
+            )
+            chosen_names = [name for names in per_chunk for name in names]
+            await asyncio.to_thread(
+                self._store_batch_choices,
+                txs,
+                keys,
+                results,
+                misses,
+                chosen_names,
+                other_id,
+            )
+        return results
+
+    async def aclassify_stream(self, txs: list[dict]) -> AsyncIterator[tuple[int, int]]:
+        """
+        aclassify_batch that yields (index, category_id) as answers arrive:
+        cache hits first, then the transactions of each model request as soon
+        as it completes (each request's answers are cached right away).
+        """
+        keys, results, misses = await asyncio.to_thread(self._lookup_batch, txs)
+        for i, cat_id in enumerate(results):
+            if cat_id is not None:
+                yield i, cat_id
+        if not misses:
+            return
+
+        categories, other_id = await asyncio.to_thread(
+            self._fetch_categories_with_other
+        )
+        # Every position of each missed key, so repeats are emitted together
+        positions: dict[bytes, list[int]] = {}
+        for i, cat_id in enumerate(results):
+            if cat_id is None:
+                positions.setdefault(keys[i], []).append(i)
+
+        async def tagged(chunk: list[int]) -> tuple[list[int], list[str | None]]:
+            names = await self._arequest_model_choices(
+                [txs[i] for i in chunk], categories
+            )
+            return chunk, names
+
+        tasks = [asyncio.create_task(tagged(chunk)) for chunk in self._chunks(misses)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                chunk, chosen_names = await next_done
+                await asyncio.to_thread(
+                    self._store_batch_choices,
+                    txs,
+                    keys,
+                    results,
+                    chunk,
+                    chosen_names,
+                    other_id,
+                )
+                for i in chunk:
+                    for j in positions[keys[i]]:
+                        yield j, results[j]
+        finally:
+            # Client went away mid-stream: drop the requests still in flight
+            for task in tasks:
+                task.cancel()
+
+    # ---------------- Offline jobs (OpenAI Batch API) ----------------
+    def submit_batch_job(self, txs: list[dict]) -> str | None:
+        """
+        Queue the uncached transactions as one Batch API job and return its
+        id, or None when everything is cached already. Each request is keyed
+        (custom_id) by its cache key and answers with a category id, so
+        collect_batch_job needs nothing else from this call, even after a
+        restart or a category rename. Once it is collected, classify_batch
+        on the same payload is all cache hits.
+        """
+        keys, _, misses = self._lookup_batch(txs)
+        if not misses:
+            return None
+        categories, other_id = self._fetch_categories_with_other()
+        ids = tuple(
+            self.db.resolve_category_id(name, fallback_other_id=other_id)
+            for name in categories
+        )
+        jsonl = b"\n".join(
+            orjson.dumps(
+                {
+                    "custom_id": keys[i].hex(),
+                    "method": "POST",
+                    "url": BATCH_JOB_ENDPOINT,
+                    "body": self._build_request(txs[i], categories, ids),
+                }
+            )
+            for i in misses
+        )
+        input_file = self.client.files.create(
+            file=("classify.jsonl", jsonl), purpose="batch"
+        )
+        job = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_JOB_ENDPOINT,
+            completion_window=BATCH_JOB_COMPLETION_WINDOW,
+        )
+        return job.id
+
+    def collect_batch_job(self, job_id: str) -> str:
+        """
+        Return the job's status; once it is "completed", first write its
+        answers to the classification cache (one upsert). Failed or refused
+        requests are skipped, to be classified normally later.
+        """
+        job = self.client.batches.retrieve(job_id)
+        if job.status != "completed" or not job.output_file_id:
+            return job.status
+        output = self.client.files.content(job.output_file_id).content
+        entries: list[tuple[bytes, int]] = []
+        for line in output.splitlines():
+            try:
+                record = orjson.loads(line)
+                body = record["response"]["body"]
+                cat_id = orjson.loads(body["choices"][0]["message"]["content"])[
+                    "category_id"
+                ]
+                key = bytes.fromhex(record["custom_id"])
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue
+            if type(cat_id) is int:
+                entries.append((key, cat_id))
+        self.db.cache_write_keys(entries)
+        return job.status
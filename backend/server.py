@@ -3,11 +3,21 @@ from __future__ import annotations
 
 from fastapi import FastAPI, HTTPException, Request, Depends, APIRouter, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
 from contextlib import asynccontextmanager
-from datetime import datetime
+import asyncio
+import base64
+from datetime import date as DateOnly
+from typing import Annotated
 
-from gpt_classifier import GPTClassifier
+import orjson
+
+# pydantic needs typing_extensions' TypedDict before Python 3.12
+from typing_extensions import NotRequired, TypedDict
+
+from gpt_classifier import ClassifyBatcher, GPTClassifier
 from database.database import Database
 
 # ---------- App name and version ----------
@@ -15,10 +25,43 @@ APP_NAME = "Expense Categorizer API"
 APP_VERSION = "0.1.0"
 
 
+def _parse_day(value: str) -> DateOnly:
+    # Strict YYYY-MM-DD; fromisoformat is C code, unlike the locale-aware
+    # strptime, but on its own would also take forms like YYYYMMDD.
+    if len(value) != 10 or value[4] != "-" or value[7] != "-":
+        raise ValueError(f"invalid date {value!r}, expected YYYY-MM-DD")
+    return DateOnly.fromisoformat(value)
+
+
+def _item_day(index: int, value: str) -> DateOnly:
+    try:
+        return _parse_day(value)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid item at index {index}: {e}"
+        )
+
+
+# GET /expenses page cursor: (date, amount, id) of the last row, opaque to clients
+def _encode_cursor(row: dict) -> str:
+    key = orjson.dumps([row["date"], row["amount"], row["id"]])
+    return base64.urlsafe_b64encode(key).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[DateOnly, float, int]:
+    d, amount, row_id = orjson.loads(base64.urlsafe_b64decode(cursor))
+    if type(row_id) is not int or type(amount) not in (int, float):
+        raise ValueError("malformed cursor")
+    return _parse_day(d), float(amount), row_id
+
+
 # ---------- Pydantic models ----------
 class Transaction(BaseModel):
+    # Strip/str-coerce here so whole payloads validate in one pass
+    model_config = ConfigDict(str_strip_whitespace=True, coerce_numbers_to_str=True)
+
     date: str = Field(..., description="YYYY-MM-DD")
-    description: str
+    description: str = ""
     amount: float
 
 
@@ -28,18 +71,69 @@ class Classified(Transaction):
     confidence: float | None = None
 
 
+# Ingest-side shape of Transaction: validating into plain dicts skips building
+# (and re-dumping) a model instance per row.
+class _TransactionIn(TypedDict):
+    __pydantic_config__ = Transaction.model_config
+
+    date: str
+    description: NotRequired[Annotated[str, Field(default="")]]
+    amount: float
+
+
+# Validates a whole /classify payload at once
+_TX_ADAPTER = TypeAdapter(list[_TransactionIn])
+
+
 class ClassifyResponse(BaseModel):
     results: list[Classified]
 
 
-class SaveExpensesRequest(BaseModel):
-    expenses: list[Classified] = Field(..., description="Expenses to persist")
+class ClassifyJob(BaseModel):
+    # None: every transaction was cached, /classify answers right away
+    job_id: str | None
+    status: str
+
+
+# POST /expenses items: unlike /classify, description is required (as it was
+# on the Classified model), so a missing one is a 422, not a silent "".
+class ClassifiedIn(TypedDict):
+    __pydantic_config__ = Transaction.model_config
+
+    date: str
+    description: str
+    amount: float
+    category: NotRequired[str | None]
+    category_id: NotRequired[int | None]
+    confidence: NotRequired[float | None]
+
+
+# A TypedDict body validates straight into dicts like _TX_ADAPTER does.
+class SaveExpensesRequest(TypedDict):
+    __pydantic_config__ = Transaction.model_config
+
+    expenses: Annotated[list[ClassifiedIn], Field(description="Expenses to persist")]
 
 
 class SaveExpensesResponse(BaseModel):
     inserted_ids: list[int]
 
 
+class StoredExpense(BaseModel):
+    id: int
+    date: str = Field(..., description="YYYY-MM-DD")
+    description: str
+    amount: float
+    category: str | None = None
+    created_at: str | None = None
+
+
+class ListExpensesResponse(BaseModel):
+    results: list[StoredExpense]
+    # Pass back as `cursor` for the next page; None once a page comes up short
+    next_cursor: str | None = None
+
+
 # ---------- App Builder ----------
 class AppBuilder:
 
@@ -58,30 +152,56 @@ class AppBuilder:
             "http://127.0.0.1:5173",
         ]
         self._provided_classifier = classifier
+        # Set by the lifespan
+        self._classifier: GPTClassifier | None = None
+        self._db: Database | None = None
+        self._batcher: ClassifyBatcher | None = None
 
     # --- lifespan: startup/teardown of long-lived resources ---
     @asynccontextmanager
     async def _lifespan(self, app: FastAPI):
         # Create (or use injected) classifier
-        app.state.classifier = self._provided_classifier or GPTClassifier()
+        classifier = self._provided_classifier or GPTClassifier()
         # Expose DB (assumes classifier has .db)
-        if not hasattr(app.state.classifier, "db"):
+        if not hasattr(classifier, "db"):
             raise RuntimeError(
                 "GPTClassifier must expose a `.db` attribute (Database)."
             )
-        app.state.db: Database = app.state.classifier.db
+        # Categories and prompts are loaded before the first request arrives,
+        # alongside opening an API connection (for a classifier made here;
+        # an injected one brings its own client)
+        await asyncio.gather(
+            asyncio.to_thread(classifier.warm_up),
+            *([classifier.aconnect()] if self._provided_classifier is None else []),
+        )
+        # Concurrent /classify requests share model calls
+        batcher = ClassifyBatcher(classifier.aclassify_batch)
+        # Kept on the builder for the dep_* functions (one app per builder)
+        # and on app.state for everything else.
+        self._classifier, self._db, self._batcher = classifier, classifier.db, batcher
+        app.state.classifier, app.state.db, app.state.batcher = (
+            classifier,
+            classifier.db,
+            batcher,
+        )
         try:
             yield
         finally:
-            # Teardown hooks for future resources (DB pools, HTTP sessions), if any.
-            pass
+            await batcher.aclose()
+            # Release the classifier's pooled HTTP connections; an injected
+            # classifier is closed by whoever created it.
+            if self._provided_classifier is None:
+                await classifier.aclose()
 
-    # --- DI: fetch classifier/db for handlers ---
-    def dep_classifier(self, request: Request) -> GPTClassifier:
-        return request.app.state.classifier
+    # --- DI: fetch classifier/db for handlers (async: no threadpool hop) ---
+    async def dep_classifier(self) -> GPTClassifier:
+        return self._classifier
 
-    def dep_db(self, request: Request) -> Database:
-        return request.app.state.db
+    async def dep_db(self) -> Database:
+        return self._db
+
+    async def dep_batcher(self) -> ClassifyBatcher:
+        return self._batcher
 
     # ---------- Handlers ----------
     def _health_handler(self):
@@ -93,65 +213,117 @@ class AppBuilder:
     def _classify_handler(self):
         async def classify_endpoint(
             req: Request,
-            clf: GPTClassifier = Depends(self.dep_classifier),
+            batcher: ClassifyBatcher = Depends(self.dep_batcher),
         ):
-            payload = await self._read_json(req)
-            items = payload.get("transactions") or payload.get("expenses")
-            if not isinstance(items, list):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Expected 'expenses' array",
-                )
-
-            transactions = self._normalize_transactions(items)
+            transactions = await self._read_transactions(req)
             if not transactions:
                 return {"results": []}
 
             try:
-                category_ids: list[int] = clf.classify_batch(transactions)
+                category_ids: list[int] = await batcher.submit(transactions)
             except Exception as e:
                 raise HTTPException(
                     status_code=500, detail=f"classify_batch failed: {e}"
                 )
 
-            results: list[dict] = []
-            for tx, cat_id in zip(transactions, category_ids):
-                results.append(
-                    {
-                        **tx,
-                        "category": None,
-                        "category_id": int(cat_id),
-                        "confidence": None,
-                    }
-                )
+            # Explicit keys instead of a {**tx, ...} copy; ids are already ints
+            results = [
+                {
+                    "date": tx["date"],
+                    "description": tx["description"],
+                    "amount": tx["amount"],
+                    "category": None,
+                    "category_id": cat_id,
+                    "confidence": None,
+                }
+                for tx, cat_id in zip(transactions, category_ids)
+            ]
             return {"results": results}
 
         return classify_endpoint
 
+    def _classify_stream_handler(self):
+        async def classify_stream_endpoint(
+            req: Request,
+            clf: GPTClassifier = Depends(self.dep_classifier),
+        ):
+            transactions = await self._read_transactions(req)
+
+            # One SSE event per transaction, in completion order:
+            # data: {"index": <position in the request>, "category_id": <id>}
+            async def events():
+                try:
+                    async for i, cat_id in clf.aclassify_stream(transactions):
+                        yield b"data: " + orjson.dumps(
+                            {"index": i, "category_id": int(cat_id)}
+                        ) + b"\n\n"
+                except Exception as e:
+                    yield b"event: error\ndata: " + orjson.dumps(
+                        {"detail": f"classify_stream failed: {e}"}
+                    ) + b"\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return classify_stream_endpoint
+
+    # Offline classification through the OpenAI Batch API: submit, poll until
+    # "completed" (which loads the answers into the cache), then POST the same
+    # payload to /classify, which is served from the cache.
+    def _submit_classify_job_handler(self):
+        async def submit_classify_job(
+            req: Request,
+            clf: GPTClassifier = Depends(self.dep_classifier),
+        ) -> ClassifyJob:
+            transactions = await self._read_transactions(req)
+            try:
+                job_id = await asyncio.to_thread(clf.submit_batch_job, transactions)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500, detail=f"submit_batch_job failed: {e}"
+                )
+            return ClassifyJob(
+                job_id=job_id, status="completed" if job_id is None else "submitted"
+            )
+
+        return submit_classify_job
+
+    def _classify_job_status_handler(self):
+        async def classify_job_status(
+            job_id: str,
+            clf: GPTClassifier = Depends(self.dep_classifier),
+        ) -> ClassifyJob:
+            try:
+                status = await asyncio.to_thread(clf.collect_batch_job, job_id)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500, detail=f"collect_batch_job failed: {e}"
+                )
+            return ClassifyJob(job_id=job_id, status=status)
+
+        return classify_job_status
+
     def _save_expenses_handler(self):
         async def save_expenses(
             payload: SaveExpensesRequest,
             db: Database = Depends(self.dep_db),
         ) -> SaveExpensesResponse:
-            items: list[dict] = []
-            for i, item in enumerate(payload.expenses):
-                try:
-                    d = datetime.strptime(item.date, "%Y-%m-%d").date()
-                    amt = float(item.amount)
-                except Exception as e:
-                    raise HTTPException(
-                        status_code=400, detail=f"Invalid item at index {i}: {e}"
-                    )
-                items.append(
-                    {
-                        "date": d,
-                        "description": item.description,
-                        "amount": amt,
-                        "category": item.category,
-                        "category_id": item.category_id,
-                    }
-                )
-            inserted_ids = db.save_expenses(items)
+            # Pydantic already validated amount as a float; only the date needs
+            # parsing, so build the whole list in one comprehension.
+            items = [
+                {
+                    "date": _item_day(i, item["date"]),
+                    "description": item["description"],
+                    "amount": item["amount"],
+                    "category": item.get("category"),
+                    "category_id": item.get("category_id"),
+                }
+                for i, item in enumerate(payload["expenses"])
+            ]
+            # Blocking DB work runs on a worker thread, off the event loop
+            try:
+                inserted_ids = await asyncio.to_thread(db.save_expenses, items)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             return SaveExpensesResponse(inserted_ids=inserted_ids)
 
         return save_expenses
@@ -164,50 +336,70 @@ class AppBuilder:
             since: str | None = Query(
                 None, description="YYYY-MM-DD lower bound on date"
             ),
+            cursor: str | None = Query(
+                None, description="next_cursor of the previous page (replaces offset)"
+            ),
         ):
             since_dt = None
             if since:
                 try:
-                    since_dt = datetime.strptime(since, "%Y-%m-%d").date()
+                    since_dt = _parse_day(since)
                 except Exception:
                     raise HTTPException(
                         status_code=400, detail=f"Invalid 'since' date: {since!r}"
                     )
-            results = db.list_expenses(limit=limit, offset=offset, since=since_dt)
-            return {"results": results}
+            before = None
+            if cursor:
+                try:
+                    before = _decode_cursor(cursor)
+                except Exception:
+                    raise HTTPException(status_code=400, detail="Invalid 'cursor'")
+                offset = 0
+            results = await asyncio.to_thread(
+                db.list_expenses,
+                limit=limit,
+                offset=offset,
+                since=since_dt,
+                before=before,
+            )
+            next_cursor = _encode_cursor(results[-1]) if len(results) == limit else None
+            return {"results": results, "next_cursor": next_cursor}
 
         return list_expenses
 
     # ---------- Private helpers ----------
     async def _read_json(self, req: Request) -> dict:
         try:
-            obj = await req.json()
+            obj = orjson.loads(await req.body())
             if not isinstance(obj, dict):
                 raise ValueError("Root JSON must be an object")
             return obj
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid JSON")
 
+    async def _read_transactions(self, req: Request) -> list[dict]:
+        payload = await self._read_json(req)
+        items = payload.get("transactions") or payload.get("expenses")
+        if not isinstance(items, list):
+            raise HTTPException(
+                status_code=400,
+                detail="Expected 'expenses' array",
+            )
+        return self._normalize_transactions(items)
+
     def _normalize_transactions(self, items: list[dict]) -> list[dict]:
-        txs: list[dict] = []
-        for i, raw in enumerate(items):
-            try:
-                tx = Transaction(
-                    date=str(raw.get("date", "")).strip(),
-                    description=str(raw.get("description", "")).strip(),
-                    amount=float(raw.get("amount")),
-                )
-                txs.append(
-                    {
-                        "date": tx.date,
-                        "description": tx.description,
-                        "amount": tx.amount,
-                    }
-                )
-            except Exception as e:
-                raise HTTPException(
-                    status_code=400, detail=f"Invalid transaction at index {i}: {e}"
-                )
+        try:
+            txs = _TX_ADAPTER.validate_python(items)
+        except ValidationError as e:
+            err = e.errors(include_url=False)[0]
+            i, *field = err["loc"]
+            where = ".".join(map(str, field))
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid transaction at index {i}: "
+                + (f"{where}: " if where else "")
+                + err["msg"],
+            )
         return txs
 
     # --- Router assembly ---
@@ -222,6 +414,26 @@ class AppBuilder:
             methods=["POST"],
             response_model=ClassifyResponse,
         )
+        router.add_api_route(
+            "/classify/stream",
+            self._classify_stream_handler(),
+            methods=["POST"],
+            summary="Classify, streaming results as server-sent events",
+        )
+        router.add_api_route(
+            "/classify/jobs",
+            self._submit_classify_job_handler(),
+            methods=["POST"],
+            response_model=ClassifyJob,
+            summary="Queue an offline (Batch API) classification job",
+        )
+        router.add_api_route(
+            "/classify/jobs/{job_id}",
+            self._classify_job_status_handler(),
+            methods=["GET"],
+            response_model=ClassifyJob,
+            summary="Status of a classification job; caches its results when done",
+        )
 
         # Persist & list expenses (new model)
         router.add_api_route(
@@ -235,6 +447,8 @@ class AppBuilder:
             "/expenses",
             self._list_expenses_handler(),
             methods=["GET"],
+            # Serialized by pydantic-core rather than jsonable_encoder + json
+            response_model=ListExpensesResponse,
             summary="List stored expenses",
         )
         return router
@@ -249,6 +463,9 @@ class AppBuilder:
             allow_methods=["*"],
             allow_headers=["*"],
         )
+        # Expense pages are repetitive JSON and shrink several-fold; small
+        # bodies and the SSE stream (excluded by default) go out as they are.
+        app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
         app.include_router(self._build_router())
         return app
 
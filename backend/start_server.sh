@@ -1,2 +1,14 @@
 #!/bin/bash
-uvicorn server:create_app --factory --reload
\ No newline at end of file
+# Development: one process with auto-reload.
+# WORKERS=N ./start_server.sh serves with N worker processes instead (no
+# reload; uvicorn[standard] already runs them on uvloop + httptools).
+# Each worker has its own in-process state:
+#   - classification LRU and category caches: hit rates per worker drop as N
+#     grows (the classification_cache table is still shared)
+#   - /classify batching window: requests only coalesce within a worker
+#   - OpenAI rate limiter: the account sees up to N x DEFAULT_MAX_RPM
+# All workers also queue on SQLite's single writer for saves.
+if [ -n "$WORKERS" ]; then
+  exec uvicorn server:create_app --factory --workers "$WORKERS"
+fi
+exec uvicorn server:create_app --factory --reload
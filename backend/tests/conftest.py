@@ -0,0 +1,47 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from database.database import Database  # noqa: E402
+from server import AppBuilder  # noqa: E402
+
+
+class FakeClassifier:
+    """Stands in for GPTClassifier: every transaction goes to the first category."""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def warm_up(self):
+        pass
+
+    async def aclassify_batch(self, transactions):
+        return [1] * len(transactions)
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    # A file, not :memory:, so the writer and reader engines share the data
+    return f"sqlite:///{tmp_path / 'expenses.db'}"
+
+
+@pytest.fixture
+def db(db_url):
+    database = Database(db_url)
+    yield database
+    database.engine.dispose()
+    database.read_engine.dispose()
+
+
+@pytest.fixture
+def client(db):
+    app = AppBuilder("test", "0", classifier=FakeClassifier(db)).create_app()
+    with TestClient(app) as c:
+        yield c
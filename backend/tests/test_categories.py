@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select, update
+
+from database import database as database_module
+from database.database import CATEGORY_CACHE_TTL, Database
+from database.tables import Category
+
+
+def test_category_ids_follow_other_workers_after_the_ttl(db, db_url, monkeypatch):
+    clock = [database_module.time.monotonic()]
+    monkeypatch.setattr(database_module.time, "monotonic", lambda: clock[0])
+    pets = db.resolve_category_id("pets")
+    other = db.get_or_create_other()
+
+    # Another worker's Database renames the category under this one
+    worker = Database(db_url)
+    with worker.session() as s:
+        s.execute(update(Category).where(Category.id == pets).values(name="animals"))
+
+    clock[0] += CATEGORY_CACHE_TTL
+    assert db.resolve_category_id("pets") == other
+    assert db.resolve_category_id("animals") == pets
+
+
+@pytest.mark.parametrize("cold", [False, True])
+def test_non_ascii_uppercase_names_resolve(db, db_url, cold):
+    with db.session() as s:
+        s.add_all([Category(name="ÉPICERIE"), Category(name="Öffentlicher Verkehr")])
+        s.flush()
+        epicerie, verkehr = (
+            s.scalar(select(Category.id).where(Category.name == n))
+            for n in ("ÉPICERIE", "Öffentlicher Verkehr")
+        )
+    # cold: the names come from the category id map, not a SQL miss
+    if cold:
+        db = Database(db_url)
+
+    assert db.resolve_category_id("ÉPICERIE") == epicerie
+    assert db.resolve_category_id("Öffentlicher verkehr") == verkehr
+    [saved] = db.save_expenses(
+        [
+            {
+                "date": date(2024, 1, 2),
+                "description": "bus",
+                "amount": 3.0,
+                "category": "ÖFFENTLICHER VERKEHR",
+            }
+        ]
+    )
+    [row] = db.get_expenses_between(
+        date(2024, 1, 1), date(2024, 1, 31), category="Öffentlicher Verkehr"
+    )
+    assert row["id"] == saved
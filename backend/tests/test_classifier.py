@@ -0,0 +1,145 @@
+import asyncio
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+import gpt_classifier
+
+
+def test_async_client_uses_http2_when_h2_is_installed(db):
+    pytest.importorskip("h2")
+    assert gpt_classifier.ASYNC_HTTP2
+    classifier = gpt_classifier.GPTClassifier(db=db)
+    pool = classifier.aclient._client._transport._pool
+    assert pool._http2
+
+
+def test_warm_up_fills_the_caches_requests_use(db):
+    builders = (
+        gpt_classifier._system_prompt,
+        gpt_classifier._response_format,
+        gpt_classifier._batch_system_prompt,
+        gpt_classifier._batch_response_format,
+    )
+    for f in builders:
+        f.cache_clear()
+    classifier = gpt_classifier.GPTClassifier(db=db)
+    classifier.warm_up()
+    misses = [f.cache_info().misses for f in builders]
+
+    categories, _ = classifier._fetch_categories_with_other()
+    tx = {"date": "2024-01-02", "description": "bread", "amount": 2.5}
+    classifier._build_request(tx, categories)
+    classifier._build_batch_request([tx], categories)
+
+    assert [f.cache_info().misses for f in builders] == misses
+
+
+def _reply(payload) -> SimpleNamespace:
+    content = payload if isinstance(payload, str) else orjson.dumps(payload).decode()
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+    )
+
+
+def test_batch_answers_without_a_valid_category_are_none(db):
+    classifier = gpt_classifier.GPTClassifier(db=db)
+    categories = ["groceries", "other"]
+    resp = _reply(
+        {
+            "results": [
+                {"index": 0, "category_id": 0},
+                {"index": 2, "category_id": 7},
+                {"index": 9, "category_id": 1},
+            ]
+        }
+    )
+    assert classifier._extract_categories(resp, 3, categories) == [
+        "groceries",
+        None,
+        None,
+    ]
+    assert classifier._extract_categories(_reply("{"), 2, categories) == [None, None]
+
+
+class _FlakyCompletions:
+    """chat.completions fake: batch replies leave out index 1, singles answer 0."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls: list[str] = []
+
+    def _answer(self, kwargs):
+        schema = kwargs["response_format"]["json_schema"]["schema"]
+        batched = "results" in schema["properties"]
+        self.calls.append("batch" if batched else "single")
+        if self.fail:
+            raise RuntimeError("rate limited")
+        if not batched:
+            return _reply({"category_id": 0})
+        rows = kwargs["messages"][1]["content"].split("\n")[1:]
+        return _reply(
+            {
+                "results": [
+                    {"index": i, "category_id": 0} for i in range(len(rows)) if i != 1
+                ]
+            }
+        )
+
+    def create(self, **kwargs):
+        return self._answer(kwargs)
+
+    async def acreate(self, **kwargs):
+        return self._answer(kwargs)
+
+
+def _flaky_classifier(db, fail=False):
+    completions = _FlakyCompletions(fail)
+    classifier = gpt_classifier.GPTClassifier(
+        db=db,
+        client=SimpleNamespace(chat=SimpleNamespace(completions=completions)),
+        aclient=SimpleNamespace(
+            chat=SimpleNamespace(
+                completions=SimpleNamespace(create=completions.acreate)
+            )
+        ),
+    )
+    return classifier, completions
+
+
+TXS = [
+    {"date": "2024-01-02", "description": f"shop {i}", "amount": float(i)}
+    for i in range(3)
+]
+
+
+@pytest.mark.parametrize("run", ["sync", "async"])
+def test_entries_missing_from_a_batch_answer_are_asked_alone(db, run):
+    classifier, completions = _flaky_classifier(db)
+    if run == "sync":
+        ids = classifier.classify_batch(TXS)
+    else:
+        ids = asyncio.run(classifier.aclassify_batch(TXS))
+
+    first = db.resolve_category_id(classifier._fetch_categories_with_other()[0][0])
+    assert ids == [first] * len(TXS)
+    assert completions.calls == ["batch", "single"]
+    assert [db.cache_lookup(tx) for tx in TXS] == ids
+
+
+@pytest.mark.parametrize("run", ["sync", "async"])
+def test_failed_model_calls_answer_other_without_caching(db, run):
+    classifier, completions = _flaky_classifier(db, fail=True)
+    classify = (
+        classifier.classify_batch
+        if run == "sync"
+        else lambda txs: asyncio.run(classifier.aclassify_batch(txs))
+    )
+    other = db.get_or_create_other()
+    assert classify(TXS) == [other] * len(TXS)
+    assert [db.cache_lookup(tx) for tx in TXS] == [None] * len(TXS)
+
+    # Nothing was cached, so the next request asks the model again
+    classify(TXS)
+    assert completions.calls.count("batch") == 2
@@ -0,0 +1,151 @@
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from gpt_classifier import GPTClassifier
+from server import _TX_ADAPTER, AppBuilder
+
+
+def test_classify_rejects_a_missing_date(client):
+    r = client.post(
+        "/classify", json={"transactions": [{"description": "bread", "amount": 2}]}
+    )
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid transaction at index 0: date: Field required"
+
+
+def test_classify_defaults_a_missing_description(client):
+    # As before the TypedDict validation: /classify never required it
+    r = client.post(
+        "/classify", json={"transactions": [{"date": "2024-01-02", "amount": 2}]}
+    )
+    assert r.status_code == 200
+    assert r.json()["results"][0]["description"] == ""
+
+
+def test_save_rejects_a_missing_date(client):
+    r = client.post("/expenses", json={"expenses": [{"description": "a", "amount": 2}]})
+    assert r.status_code == 422
+    [error] = r.json()["detail"]
+    assert error["loc"] == ["body", "expenses", 0, "date"]
+
+
+class _Completions:
+    """Async chat.completions fake: answers every batch line with position 1."""
+
+    async def create(self, **kwargs):
+        lines = kwargs["messages"][1]["content"].split("\n")[1:]
+        results = [{"index": i, "category_id": 1} for i in range(len(lines))]
+        message = SimpleNamespace(content=orjson.dumps({"results": results}).decode())
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class _Files:
+    def __init__(self):
+        self.store = {}
+
+    def create(self, file, purpose):
+        self.store["input"] = file[1]
+        return SimpleNamespace(id="input")
+
+    def content(self, file_id):
+        return SimpleNamespace(content=self.store[file_id])
+
+
+class _Batches:
+    """Batch API fake: in progress until `done`, then answers enum[1] per line."""
+
+    def __init__(self, files):
+        self.files = files
+        self.done = False
+
+    def create(self, **kwargs):
+        return SimpleNamespace(id="batch_1")
+
+    def retrieve(self, job_id):
+        if not self.done:
+            return SimpleNamespace(status="in_progress", output_file_id=None)
+        out = []
+        for line in self.files.store["input"].splitlines():
+            request = orjson.loads(line)
+            schema = request["body"]["response_format"]["json_schema"]["schema"]
+            choice = {"category_id": schema["properties"]["category_id"]["enum"][1]}
+            body = {
+                "choices": [{"message": {"content": orjson.dumps(choice).decode()}}]
+            }
+            out.append(
+                orjson.dumps(
+                    {
+                        "custom_id": request["custom_id"],
+                        "response": {"status_code": 200, "body": body},
+                    }
+                )
+            )
+        self.files.store["output"] = b"\n".join(out)
+        return SimpleNamespace(status="completed", output_file_id="output")
+
+
+@pytest.fixture
+def batches():
+    return _Batches(_Files())
+
+
+@pytest.fixture
+def gpt_client(db, batches):
+    classifier = GPTClassifier(
+        db=db,
+        client=SimpleNamespace(files=batches.files, batches=batches),
+        aclient=SimpleNamespace(chat=SimpleNamespace(completions=_Completions())),
+    )
+    app = AppBuilder("test", "0", classifier=classifier).create_app()
+    with TestClient(app) as c:
+        yield c
+
+
+TXS = [
+    {"date": "2024-01-02", "description": f"shop {i}", "amount": i} for i in range(5)
+]
+
+
+def test_classify_stream_sends_one_event_per_transaction(gpt_client, db):
+    cached = 5
+    db.cache_write(_TX_ADAPTER.validate_python(TXS)[3], cached)
+    r = gpt_client.post("/classify/stream", json={"transactions": TXS})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [
+        orjson.loads(line[len("data: ") :])
+        for line in r.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert sorted(e["index"] for e in events) == list(range(len(TXS)))
+
+    by_index = {e["index"]: e["category_id"] for e in events}
+    assert by_index[3] == cached
+    assert all(by_index[i] != cached for i in (0, 1, 2, 4))
+    # Streamed answers were cached: /classify now returns the same ids
+    results = gpt_client.post("/classify", json={"transactions": TXS}).json()
+    assert [x["category_id"] for x in results["results"]] == [
+        by_index[i] for i in range(len(TXS))
+    ]
+
+
+def test_classify_job_lifecycle(gpt_client, batches, db):
+    r = gpt_client.post("/classify/jobs", json={"transactions": TXS})
+    assert r.json() == {"job_id": "batch_1", "status": "submitted"}
+    assert len(batches.files.store["input"].splitlines()) == len(TXS)
+
+    status = gpt_client.get("/classify/jobs/batch_1").json()
+    assert status["status"] == "in_progress"
+
+    batches.done = True
+    status = gpt_client.get("/classify/jobs/batch_1").json()
+    assert status["status"] == "completed"
+
+    # Results landed in the cache: everything is answered without a new job
+    category_ids = [db.cache_lookup(tx) for tx in _TX_ADAPTER.validate_python(TXS)]
+    assert None not in category_ids and len(set(category_ids)) == 1
+    r = gpt_client.post("/classify/jobs", json={"transactions": TXS})
+    assert r.json() == {"job_id": None, "status": "completed"}
@@ -0,0 +1,58 @@
+def _expense(**overrides):
+    item = {"date": "2024-01-02", "description": "bread", "amount": 2.5}
+    item.update(overrides)
+    return item
+
+
+def test_save_with_unknown_category_id_is_rejected(client):
+    r = client.post("/expenses", json={"expenses": [_expense(category_id=999)]})
+    assert r.status_code == 400
+    assert "999" in r.json()["detail"]
+    assert client.get("/expenses").json()["results"] == []
+
+
+def test_save_with_known_category_id(client):
+    r = client.post("/expenses", json={"expenses": [_expense(category_id=1)]})
+    assert r.status_code == 200
+    [saved] = client.get("/expenses").json()["results"]
+    assert saved["id"] == r.json()["inserted_ids"][0]
+
+
+def test_saving_the_same_expense_twice_dedupes(client):
+    first = client.post("/expenses", json={"expenses": [_expense(), _expense()]})
+    again = client.post("/expenses", json={"expenses": [_expense()]})
+    ids = first.json()["inserted_ids"]
+    assert ids[0] == ids[1] == again.json()["inserted_ids"][0]
+    assert len(client.get("/expenses").json()["results"]) == 1
+
+
+def test_cursor_pages_through_every_expense_once(client):
+    # Ties on date and amount are broken by id
+    expenses = [
+        _expense(date=f"2024-01-0{1 + i % 3}", amount=i % 2, description=f"e{i}")
+        for i in range(7)
+    ]
+    ids = client.post("/expenses", json={"expenses": expenses}).json()["inserted_ids"]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/expenses", params=params).json()
+        seen += page["results"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(r["id"] for r in seen) == sorted(ids)
+    keys = [(r["date"], r["amount"], r["id"]) for r in seen]
+    assert keys == sorted(keys, reverse=True)
+    assert client.get("/expenses", params={"cursor": "nope"}).status_code == 400
+
+
+def test_save_rejects_a_missing_description(client):
+    item = _expense()
+    del item["description"]
+    r = client.post("/expenses", json={"expenses": [item]})
+    assert r.status_code == 422
+    [error] = r.json()["detail"]
+    assert error["loc"] == ["body", "expenses", 0, "description"]
@@ -0,0 +1,14 @@
+import json
+
+import pytest
+
+from database.services.hashing import normalize_for_hash
+
+
+@pytest.mark.parametrize(
+    "description", ["bread", "café", "tab\there", "del\x7fbyte", 'q"uote\\']
+)
+def test_normalized_bytes_match_the_json_form(description):
+    payload = {"date": "2024-01-02", "description": description, "amount": 2.5}
+    expected = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    assert normalize_for_hash(payload) == expected.encode("ascii")
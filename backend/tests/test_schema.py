@@ -0,0 +1,151 @@
+from datetime import date
+
+import pytest
+import sqlalchemy as sa
+
+from database.database import Database
+from database.services.hashing import tx_digest
+from database.tables import Category, Expense
+
+
+def test_case_duplicate_categories_are_merged_before_unique_index(db_url):
+    Database(db_url).engine.dispose()
+    engine = sa.create_engine(db_url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_categories_name_lower")
+        keep = conn.scalar(sa.text("SELECT id FROM categories WHERE name = 'pets'"))
+        dup = conn.execute(sa.insert(Category).values(name="Pets")).lastrowid
+        conn.execute(
+            sa.insert(Expense).values(
+                date=date(2024, 1, 2), amount_cents=250, category_id=dup
+            )
+        )
+    engine.dispose()
+
+    db = Database(db_url)
+    with db.engine.connect() as conn:
+        assert conn.scalars(
+            sa.text("SELECT id FROM categories WHERE lower(name) = 'pets'")
+        ).all() == [keep]
+        assert conn.scalar(sa.text("SELECT category_id FROM expenses")) == keep
+        assert conn.scalar(
+            sa.text(
+                "SELECT count(*) FROM sqlite_master"
+                " WHERE name = 'ix_categories_name_lower'"
+            )
+        )
+
+
+# Tables as the first release created them: float amounts, hex digest keys
+BASELINE_SCHEMA = """
+CREATE TABLE categories (
+    id INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR(120) NOT NULL UNIQUE,
+    description TEXT,
+    is_active BOOLEAN NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL
+);
+CREATE TABLE classification_cache (
+    hash VARCHAR(64) NOT NULL PRIMARY KEY,
+    category_id INTEGER NOT NULL,
+    created_at DATETIME NOT NULL
+);
+CREATE TABLE expenses (
+    id INTEGER NOT NULL PRIMARY KEY,
+    date DATE NOT NULL,
+    amount FLOAT NOT NULL,
+    description TEXT NOT NULL,
+    category_id INTEGER NOT NULL REFERENCES categories (id) ON DELETE RESTRICT,
+    hash VARCHAR(64) UNIQUE,
+    created_at DATETIME NOT NULL
+);
+CREATE INDEX ix_expenses_category_date ON expenses (category_id, date DESC);
+INSERT INTO categories VALUES
+    (1, 'groceries', '', 1, '2024-01-01 00:00:00', '2024-01-01 00:00:00');
+"""
+
+TX = {"date": "2024-01-02", "description": "bread", "amount": 12.34}
+
+
+@pytest.fixture
+def baseline_url(db_url):
+    engine = sa.create_engine(db_url)
+    with engine.begin() as conn:
+        conn.connection.executescript(BASELINE_SCHEMA)
+        conn.execute(
+            sa.text(
+                "INSERT INTO expenses VALUES"
+                " (1, '2024-01-02', 12.34, 'bread', 1, :hash, '2024-01-02 00:00:00')"
+            ),
+            {"hash": tx_digest({**TX, "category_id": 1}).hex()},
+        )
+        conn.execute(
+            sa.text(
+                "INSERT INTO classification_cache"
+                " VALUES (:hash, 1, '2024-01-02 00:00:00')"
+            ),
+            {"hash": tx_digest(TX).hex()},
+        )
+    engine.dispose()
+    return db_url
+
+
+def test_baseline_amounts_become_integer_cents(baseline_url):
+    db = Database(baseline_url)
+    with db.engine.connect() as conn:
+        # The FLOAT column keeps REAL affinity; whole cents are stored exactly
+        assert conn.scalar(sa.text("SELECT amount FROM expenses")) == 1234
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == 1
+    [row] = db.list_expenses()
+    assert row["amount"] == 12.34
+
+    # A second start must not scale the amounts again
+    db.engine.dispose()
+    [row] = Database(baseline_url).list_expenses()
+    assert row["amount"] == 12.34
+
+
+def test_baseline_hex_keys_become_digests(baseline_url):
+    db = Database(baseline_url)
+    with db.engine.connect() as conn:
+        for table in ("expenses", "classification_cache"):
+            assert conn.scalar(sa.text(f"SELECT typeof(hash) FROM {table}")) == "blob"
+    assert db.cache_lookup(TX) == 1
+
+
+def test_sqlite_pragmas(db):
+    with db.engine.connect() as conn:
+        pragma = conn.exec_driver_sql
+        assert pragma("PRAGMA journal_mode").scalar() == "wal"
+        assert pragma("PRAGMA foreign_keys").scalar() == 1
+        assert pragma("PRAGMA query_only").scalar() == 0
+    with db.read_engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+        assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 1
+        with pytest.raises(sa.exc.OperationalError):
+            conn.exec_driver_sql("DELETE FROM categories")
+
+
+def test_half_cent_amounts_round_up_on_migration_and_insert(baseline_url):
+    engine = sa.create_engine(baseline_url)
+    with engine.begin() as conn:
+        conn.execute(
+            sa.text(
+                "INSERT INTO expenses VALUES"
+                " (:id, '2024-01-03', :amount, '', 1, NULL, '2024-01-03 00:00:00')"
+            ),
+            [{"id": 2, "amount": 2.205}, {"id": 3, "amount": 1.005}],
+        )
+    engine.dispose()
+
+    db = Database(baseline_url)
+    db.save_expenses(
+        [
+            {"date": date(2024, 1, 4), "description": d, "amount": a}
+            for d, a in (("a", 2.205), ("b", 1.005))
+        ]
+    )
+    with db.engine.connect() as conn:
+        cents = conn.scalars(sa.text("SELECT amount FROM expenses ORDER BY id")).all()
+    assert cents == [1234, 221, 101, 221, 101]
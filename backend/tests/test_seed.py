@@ -0,0 +1,16 @@
+from sqlalchemy import delete, func, select
+
+from database.services.seed import DEFAULT_SEED, ensure_seed
+from database.tables import Category
+
+
+def test_missing_seed_names_are_added_despite_user_categories(db):
+    with db.Session() as s:
+        s.execute(delete(Category).where(Category.name == "other"))
+        s.add_all(Category(name=f"custom {i}") for i in range(len(DEFAULT_SEED)))
+        s.commit()
+
+        ensure_seed(s)
+
+        names = set(s.scalars(select(func.lower(Category.name))))
+        assert {n for n, _ in DEFAULT_SEED} <= names
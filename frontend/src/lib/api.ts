@@ -8,6 +8,7 @@ export type Classified = Transaction & {
 
 // Rows returned by GET /expenses
 export type ExpenseRow = {
+  id: number;
   date: string;
   description: string;
   amount: number;
@@ -47,13 +48,16 @@ export async function saveExpenses(expenses: Classified[]): Promise<number[]> {
 }
 
 // --- List expenses ---
+// Pass the previous page's nextCursor to get the page after it; nextCursor is
+// null once there are no more rows.
 export async function fetchExpenses(
   limit = 50,
-  offset = 0,
+  cursor: string | null = null,
   opts?: { since?: string },
   signal?: AbortSignal
-): Promise<ExpenseRow[]> {
-  const params = new URLSearchParams({ limit: String(limit), offset: String(offset) });
+): Promise<{ rows: ExpenseRow[]; nextCursor: string | null }> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) params.set("cursor", cursor);
   if (opts?.since) params.set("since", opts.since);
   const res = await fetch(`${base}/expenses?${params}`, { method: "GET", signal });
   if (!res.ok) {
@@ -61,5 +65,8 @@ export async function fetchExpenses(
     throw new Error(`GET /expenses failed (${res.status}): ${text || res.statusText}`);
   }
   const json = await res.json();
-  return (json?.results ?? []) as ExpenseRow[];
+  return {
+    rows: (json?.results ?? []) as ExpenseRow[],
+    nextCursor: (json?.next_cursor ?? null) as string | null,
+  };
 }
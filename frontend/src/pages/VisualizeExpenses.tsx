@@ -9,12 +9,13 @@ export default function VisualizeExpenses() {
   const [rows, setRows] = useState<ExpenseRow[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
-  const [offset, setOffset] = useState(0);
+  const [cursor, setCursor] = useState<string | null>(null);
   const [hasMore, setHasMore] = useState(true);
 
   const abortRef = useRef<AbortController | null>(null);
 
-  async function loadPage(nextOffset: number) {
+  // cursor null: first page
+  async function loadPage(pageCursor: string | null) {
     setLoading(true);
     setError(null);
     try {
@@ -22,15 +23,15 @@ export default function VisualizeExpenses() {
       abortRef.current?.abort();
       abortRef.current = new AbortController();
 
-      const chunk = await fetchExpenses(
+      const { rows: chunk, nextCursor } = await fetchExpenses(
         PAGE_SIZE,
-        nextOffset,
+        pageCursor,
         undefined,
         abortRef.current.signal
       );
-      setRows((prev) => (nextOffset === 0 ? chunk : [...prev, ...chunk]));
-      setHasMore(chunk.length === PAGE_SIZE);
-      setOffset(nextOffset + chunk.length);
+      setRows((prev) => (pageCursor === null ? chunk : [...prev, ...chunk]));
+      setHasMore(nextCursor !== null);
+      setCursor(nextCursor);
     } catch (e: any) {
       if (e?.name === "AbortError") return;
       setError(e?.message ?? String(e));
@@ -41,7 +42,7 @@ export default function VisualizeExpenses() {
 
   // initial load
   useEffect(() => {
-    loadPage(0);
+    loadPage(null);
     return () => abortRef.current?.abort();
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
@@ -103,7 +104,7 @@ export default function VisualizeExpenses() {
           <section className="section row wrap">
             <button
               className="btn btn-outline"
-              onClick={() => loadPage(0)}
+              onClick={() => loadPage(null)}
               disabled={loading}
               title="Reload from start"
             >
@@ -111,7 +112,7 @@ export default function VisualizeExpenses() {
             </button>
             <button
               className="btn btn-primary"
-              onClick={() => loadPage(offset)}
+              onClick={() => loadPage(cursor)}
               disabled={loading || !hasMore}
               title="Fetch next page"
             >